@@ -28,6 +28,8 @@ hiddenimports = [
     'src.crawlers.article_extractor',
     'src.crawlers.media_downloader',
     'src.crawlers.article_manager',
+    'src.crawlers.image_hash_index',
+    'src.crawlers.image_postprocessor',
     'src.utils.log_utils',
     'src.utils.scheduler_manager',
     'src.utils.ai_generator',
@@ -45,6 +47,8 @@ hiddenimports = [
     'flask.templating',
     'flask.stream_with_context',
     'requests',
+    'PIL.Image',
+    'numpy',
     'queue',
     'threading',
     'datetime',
@@ -64,7 +68,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=['tkinter', 'unittest', 'test', 'tests', 'PIL', 'matplotlib', 'numpy', 'scipy'],
+    excludes=['tkinter', 'unittest', 'test', 'tests', 'matplotlib', 'scipy'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=None,
@@ -45,6 +45,9 @@ class ConfigManager:
         # 文章ID记录文件路径
         self.article_id_file = os.path.join(self.project_root, 'toutiao_article_id.txt')
         
+        # 文章ID数据库路径（旧版文本文件在首次运行时导入）
+        self.article_id_db = os.path.join(self.project_root, 'toutiao_article_id.db')
+        
         # 配置文件路径
         self.config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yml')
     
@@ -94,6 +97,7 @@ class ConfigManager:
             'media_base_dir': self.media_base_dir,
             'content_file': self.content_file,
             'article_id_file': self.article_id_file,
+            'article_id_db': self.article_id_db,
             'is_debug': self.is_debug
         }
     
@@ -1,60 +1,77 @@
 from bs4 import BeautifulSoup
 import re
-import time
+from crawlers.page_waiter import PageWaiter, FEED_CARD_SELECTOR
+
+# 首页five-item卡片与频道feed卡片的匹配模式
+FIVE_ITEM_PATTERN = re.compile('<div class="five-item"><i.*?</i><a href="(.*?)".*?aria-label="(.*?)">', re.S)
+FEED_CARD_PATTERN = re.compile('<div class="feed-card-article-l"><a href="(.*?)".*?aria-label="(.*?)">', re.S)
+ARTICLE_ID_PATTERN = re.compile(r'/article/(\d+)/')
 
 class ArticleExtractor:
     """文章内容提取器类"""
     
-    def extract_uncrawled_article(self, html, channel_name, crawled_ids, is_homepage=False):
-        # 提取所有可能的文章匹配项（包括两种格式）
-        all_matches = []
+    def extract_uncrawled_articles(self, html, channel_name, crawled_ids, processed_ids=None, is_homepage=False):
+        """一次解析页面，依次产出所有未爬取的文章
         
-        # 只有在首页时才执行five-item的正则匹配
+        直接对各个已见集合做成员检查，不复制合并集合；同一次解析中重复出现的文章只产出一次。
+        
+        Args:
+            html: 页面HTML
+            channel_name: 频道名称，仅用于日志
+            crawled_ids: 历史已爬取的文章ID集合
+            processed_ids: 本次运行中已收集的文章ID集合（跨频道共享），可为None
+            is_homepage: 首页时同时匹配five-item卡片
+            
+        Yields:
+            (article_url, article_title, article_id)
+        """
+        patterns = [FEED_CARD_PATTERN]
         if is_homepage:
-            five_item_matches = re.findall('<div class="five-item"><i.*?</i><a href="(.*?)".*?aria-label="(.*?)">', html, re.S)
-            all_matches.extend(five_item_matches)
+            # 只有在首页时才执行five-item的正则匹配
+            patterns.insert(0, FIVE_ITEM_PATTERN)
         
-        # 执行feed-card-article-l的正则匹配
-        article_matches = re.findall('<div class="feed-card-article-l"><a href="(.*?)".*?aria-label="(.*?)">', html, re.S)
-        all_matches.extend(article_matches)
+        yielded_ids = set()
+        match_count = 0
+        for pattern in patterns:
+            for match in pattern.finditer(html):
+                match_count += 1
+                article_relative_url, article_title = match.group(1), match.group(2)
+                
+                if article_relative_url.startswith('https://'):
+                    article_url = article_relative_url
+                else:
+                    article_url = 'https://www.toutiao.com' + article_relative_url
+                
+                # 从URL中提取文章ID - 能处理完整URL和相对URL
+                article_id_match = ARTICLE_ID_PATTERN.search(article_relative_url)
+                if not article_id_match:
+                    print(f"无法从URL中提取文章ID: {article_url}，尝试下一篇")
+                    continue
+                
+                article_id = article_id_match.group(1)
+                if article_id in yielded_ids or article_id in crawled_ids:
+                    continue
+                if processed_ids is not None and article_id in processed_ids:
+                    continue
+                
+                yielded_ids.add(article_id)
+                yield article_url, article_title, article_id
         
-        print(f"{channel_name} 频道提取到 {len(all_matches)} 篇文章")
+        print(f"{channel_name} 频道提取到 {match_count} 篇文章，其中未爬取 {len(yielded_ids)} 篇")
+    
+    def extract_uncrawled_article(self, html, channel_name, crawled_ids, is_homepage=False):
+        """提取第一篇未爬取的文章
         
-        # 遍历所有文章，找到第一个未爬取的文章
-        for i, match in enumerate(all_matches):
-            article_relative_url = match[0]
-            article_title = match[1]
-            
-            if article_relative_url.startswith('https://'):
-                article_url = article_relative_url
-            else:
-                article_url = 'https://www.toutiao.com' + article_relative_url
-            
-            # 从URL中提取文章ID - 能处理完整URL和相对URL
+        首页返回(article_url, article_title, found)，频道页返回(article_title, article_url)
+        """
+        for article_url, article_title, _ in self.extract_uncrawled_articles(
+            html, channel_name, crawled_ids, is_homepage=is_homepage
+        ):
             if is_homepage:
-                # 首页的URL是完整的，直接从article_url中提取
-                article_id_match = re.search(r'/article/(\d+)/', article_url)
-            else:
-                # 频道页面的URL是相对的，从article_relative_url中提取
-                article_id_match = re.search(r'/article/(\d+)/', article_relative_url)
-            if article_id_match:
-                article_id = article_id_match.group(1)
-                
-                # 检查文章是否已爬取
-                if article_id in crawled_ids:
-                    # print(f"文章 {article_id} ({article_title}) 已爬取过，尝试提取 {channel_name} 频道的下一篇文章")
-                    continue  # 继续尝试下一篇文章
-                else:
-                    # print(f"找到 {channel_name} 频道第{i+1}篇未爬取的文章: {article_title}")
-                    # print(f"文章URL: {article_url}")
-                    if is_homepage:
-                        # 首页返回不同格式
-                        return article_url, article_title, True
-                    else:
-                        # 普通频道返回
-                        return article_title, article_url
-            else:
-                print(f"无法从URL中提取文章ID: {article_url}，尝试下一篇")
+                # 首页返回不同格式
+                return article_url, article_title, True
+            # 普通频道返回
+            return article_title, article_url
         
         # 如果所有文章都已爬取过
         print(f"{channel_name} 频道所有文章都已爬取过")
@@ -65,6 +82,59 @@ class ArticleExtractor:
             # 普通频道返回
             return None, None
     
+    # 在页面中执行的卡片提取脚本：只返回水位线之后新增的卡片，避免序列化整个DOM
+    FEED_CARDS_SCRIPT = r"""
+        var watermark = arguments[0] || 0;
+        var selector = arguments[1] ? '.five-item > a, .feed-card-article-l > a' : '.feed-card-article-l > a';
+        var cards = document.querySelectorAll(selector);
+        // 频道切换后列表被重新渲染，卡片数少于水位线时从头开始
+        if (cards.length < watermark) {
+            watermark = 0;
+        }
+        var records = [];
+        for (var i = watermark; i < cards.length; i++) {
+            var href = cards[i].getAttribute('href') || '';
+            var match = href.match(/\/article\/(\d+)\//);
+            records.push({
+                url: href,
+                title: cards[i].getAttribute('aria-label') || (cards[i].textContent || '').trim(),
+                id: match ? match[1] : null
+            });
+        }
+        return {records: records, watermark: cards.length};
+    """
+    
+    def extract_feed_cards_js(self, driver, watermark=0, is_homepage=False):
+        """在浏览器中执行脚本提取水位线之后新增的文章卡片
+        
+        Args:
+            driver: Selenium浏览器实例
+            watermark: 上次提取时的卡片数量
+            is_homepage: 首页时同时提取five-item卡片
+            
+        Returns:
+            (records, new_watermark)，records为{url, title, id}字典列表，url已补全为完整地址
+        """
+        result = driver.execute_script(self.FEED_CARDS_SCRIPT, watermark, is_homepage) or {}
+        records = []
+        for record in result.get('records', []):
+            if not record.get('id') or not record.get('url'):
+                continue
+            url = record['url']
+            if url.startswith('//'):
+                url = 'https:' + url
+            elif not url.startswith('https://'):
+                url = 'https://www.toutiao.com' + url
+            records.append({'url': url, 'title': record.get('title', ''), 'id': record['id']})
+        return records, result.get('watermark', watermark)
+    
+    def extract_article_content(self, article_html):
+        """从文章详情页HTML中截取正文部分，未找到时返回None"""
+        content_match = re.search(r'syl-device-pc">(.*?)</article>', article_html, re.S)
+        if content_match:
+            return content_match.group(1)
+        return None
+    
     def extract_content_with_bs(self, html_content):
         soup = BeautifulSoup(html_content, 'html.parser')
         # 移除脚本和样式标签
@@ -92,16 +162,20 @@ class ArticleExtractor:
             print(f"导航项文本: {item_text}")
             
             # 确保元素在可视区域内
-            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", target_item)
-            time.sleep(1)
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", target_item)
+            
+            # 点击前记录当前的第一张卡片，用于确认页面已切换到新频道
+            waiter = PageWaiter(driver)
+            previous_cards = waiter.snapshot(FEED_CARD_SELECTOR)
             
             # 使用JavaScript点击该元素
             print(f"使用JavaScript点击 {channel_name} 导航项...")
             driver.execute_script("arguments[0].click();", target_item)
             print(f"{channel_name} 导航项点击成功")
             
-            # 等待页面切换和加载
-            time.sleep(3)
+            # 等待旧卡片被替换，再等待新频道的卡片加载
+            waiter.wait_for_replaced(FEED_CARD_SELECTOR, previous_cards)
+            waiter.wait_until_ready(FEED_CARD_SELECTOR)
             
             # 获取页面内容
             html = driver.page_source
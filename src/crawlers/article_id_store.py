@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ArticleIdStore:
+    """基于SQLite的已爬取文章ID存储
+
+    - 文章ID为主键，contains/add均为索引查询，启动时无需加载全部历史记录
+    - 每条记录保存各自首次爬取的时间戳，过期判断按记录单独进行
+    - 过期记录在查询时即被视为不存在，并通过compact分批删除（增量压缩）
+    - 支持 `article_id in store` 和 `len(store)`，可直接替代原来的set
+    - 支持多进程/多线程通过claim认领文章（带租约），同一篇文章同一时间只会被一个任务处理
+    """
+
+    def __init__(self, db_file, ttl_days=14, legacy_file=None):
+        """
+        Args:
+            db_file: SQLite数据库文件路径
+            ttl_days: 记录保留天数，0表示永久保留
+            legacy_file: 旧版文本格式的ID文件（每行"id,timestamp"），首次打开时导入
+        """
+        self.db_file = db_file
+        self.ttl_seconds = ttl_days * 24 * 3600 if ttl_days else 0
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # timeout为其他进程持有写锁时的等待时间
+        self._conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS article_ids ("
+            "article_id TEXT PRIMARY KEY, crawled_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_article_ids_crawled_at ON article_ids (crawled_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # 文章认领表：正在被某个任务处理的文章及其租约到期时间
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS claims ("
+            "article_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+        if legacy_file:
+            self._import_legacy_file(legacy_file)
+
+    @contextmanager
+    def _transaction(self, immediate=False):
+        """显式事务，出错时回滚；immediate为True时开始即获取写锁，用于先读后写的原子操作"""
+        self._conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _cutoff(self):
+        """早于该时间戳的记录视为过期"""
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0
+
+    def _import_legacy_file(self, legacy_file):
+        """导入旧版文本ID文件，只执行一次，保留每行原有的时间戳"""
+        if not os.path.exists(legacy_file):
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone()
+            if row:
+                return
+            rows = []
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split(',')
+                    if len(parts) != 2:
+                        continue
+                    try:
+                        rows.append((parts[0], float(parts[1])))
+                    except ValueError:
+                        continue
+            with self._transaction():
+                self._conn.executemany("INSERT OR IGNORE INTO article_ids (article_id, crawled_at) VALUES (?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(time.time()),))
+        print(f"已从 {legacy_file} 导入 {len(rows)} 条文章ID记录")
+
+    def contains(self, article_id):
+        """判断文章是否已爬取（且未过期）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM article_ids WHERE article_id = ? AND crawled_at >= ?",
+                (str(article_id), self._cutoff())
+            ).fetchone()
+        return row is not None
+
+    def add(self, article_id, timestamp=None):
+        """记录文章ID，已存在时保留首次爬取的时间戳"""
+        self.add_many([(article_id, timestamp)])
+
+    def add_many(self, records):
+        """批量记录文章ID，records为(article_id, timestamp)列表，timestamp为None时使用当前时间"""
+        now = time.time()
+        rows = [(str(article_id), timestamp if timestamp is not None else now) for article_id, timestamp in records]
+        if not rows:
+            return
+        cutoff = self._cutoff()
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO article_ids (article_id, crawled_at) VALUES (?, ?)", rows
+            )
+            # 过期但尚未被压缩删除的记录视为新记录，更新时间戳
+            self._conn.executemany(
+                "UPDATE article_ids SET crawled_at = ? WHERE article_id = ? AND crawled_at < ?",
+                [(timestamp, article_id, cutoff) for article_id, timestamp in rows]
+            )
+
+    def compact(self, batch_size=1000):
+        """删除一批过期记录，返回删除的数量
+
+        每次只删除batch_size条，启动时调用一次即可，无需一次性重写全部数据。
+        """
+        with self._lock:
+            # 顺带清理已过期的认领
+            self._conn.execute("DELETE FROM claims WHERE expires_at < ?", (time.time(),))
+        if not self.ttl_seconds:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM article_ids WHERE rowid IN ("
+                "SELECT rowid FROM article_ids WHERE crawled_at < ? LIMIT ?)",
+                (self._cutoff(), batch_size)
+            )
+        return cursor.rowcount
+
+    def claim(self, article_id, owner, lease_seconds=1800):
+        """认领一篇文章，成功返回True
+        
+        文章已爬取，或已被其他任务认领且租约未到期时返回False。
+        检查和写入在同一个IMMEDIATE事务中完成，多个进程同时认领时只有一个会成功；
+        持有者崩溃后租约到期，文章可被重新认领。
+        """
+        article_id = str(article_id)
+        now = time.time()
+        with self._lock, self._transaction(immediate=True):
+            crawled = self._conn.execute(
+                "SELECT 1 FROM article_ids WHERE article_id = ? AND crawled_at >= ?",
+                (article_id, self._cutoff())
+            ).fetchone()
+            if crawled:
+                return False
+            row = self._conn.execute(
+                "SELECT owner, expires_at FROM claims WHERE article_id = ?", (article_id,)
+            ).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO claims (article_id, owner, expires_at) VALUES (?, ?, ?)",
+                (article_id, owner, now + lease_seconds)
+            )
+            return True
+
+    def release_claims(self, article_ids, owner):
+        """释放指定任务持有的认领"""
+        rows = [(str(article_id), owner) for article_id in article_ids]
+        if not rows:
+            return
+        with self._lock, self._transaction():
+            self._conn.executemany("DELETE FROM claims WHERE article_id = ? AND owner = ?", rows)
+
+    def release_all_claims(self, owner):
+        """释放指定任务持有的全部认领（运行结束时调用）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM claims WHERE owner = ?", (owner,))
+
+    def iter_since(self, timestamp):
+        """遍历指定时间之后的记录，产出(article_id, crawled_at)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT article_id, crawled_at FROM article_ids WHERE crawled_at >= ?", (timestamp,)
+            ).fetchall()
+        for row in rows:
+            yield row
+
+    def __contains__(self, article_id):
+        return self.contains(article_id)
+
+    def __len__(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM article_ids WHERE crawled_at >= ?", (self._cutoff(),)
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
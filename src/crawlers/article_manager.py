@@ -1,44 +1,136 @@
 import os
 import time
-from datetime import datetime, timedelta
+import uuid
+import socket
+from crawlers.article_id_store import ArticleIdStore
+from crawlers.bloom_filter import RotatingBloomFilter, SeenFilter
+from crawlers.id_journal import ArticleIdJournal, STATUS_SAVED, STATUS_FAILED
 
 class ArticleManager:
     """文章管理器类"""
     
-    def __init__(self, article_id_file):
+    def __init__(self, article_id_file, article_id_db=None, ttl_days=14, seen_filter_config=None, journal_batch_size=20,
+                 claim_lease_seconds=1800):
+        """
+        Args:
+            article_id_file: 旧版文本格式的文章ID文件，首次运行时导入到数据库
+            article_id_db: 文章ID数据库文件，默认与文本文件同目录同名（扩展名.db）
+            ttl_days: 文章ID保留天数
+            seen_filter_config: 布隆过滤器配置（enabled、days、capacity_per_day、error_rate），
+                启用后文章ID至少保留days天
+            journal_batch_size: 写后日志每批提交的记录数
+            claim_lease_seconds: 认领文章的租约时长（秒），持有者崩溃后超过该时长文章可被重新认领
+        """
         self.article_id_file = article_id_file
+        self.article_id_db = article_id_db or os.path.splitext(article_id_file)[0] + '.db'
+        self.seen_filter_config = seen_filter_config or {}
+        self.use_seen_filter = bool(self.seen_filter_config.get('enabled', False))
+        if self.use_seen_filter:
+            ttl_days = max(ttl_days, self.seen_filter_config.get('days', 90))
+        self.ttl_days = ttl_days
+        self.journal_batch_size = journal_batch_size
+        self.claim_lease_seconds = claim_lease_seconds
+        # 认领者标识：同一进程中的多个爬虫实例（定时任务与手动运行）也互不相同
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store = None
+        self.seen = None
+        self.journal = None
+    
+    def _open_seen_filter(self):
+        """打开按天分桶的布隆过滤器，首次启用时用数据库中的记录预热"""
+        bloom_dir = os.path.join(os.path.dirname(self.article_id_db) or '.', 'seen_filter')
+        bloom = RotatingBloomFilter(
+            bloom_dir,
+            days=self.seen_filter_config.get('days', 90),
+            capacity_per_day=self.seen_filter_config.get('capacity_per_day', 5000),
+            error_rate=self.seen_filter_config.get('error_rate', 0.001)
+        )
+        if bloom.is_empty:
+            since = time.time() - bloom.days * 24 * 3600
+            count = 0
+            for article_id, crawled_at in self.store.iter_since(since):
+                bloom.add(article_id, crawled_at)
+                count += 1
+            bloom.flush()
+            if count:
+                print(f"布隆过滤器已从数据库预热 {count} 条记录")
+        return SeenFilter(bloom, self.store)
     
     def read_article_ids(self):
-        article_ids = set()
+        """打开文章ID存储并返回，返回值支持 `in` 判断，无需把全部历史记录读入内存"""
         try:
-            if os.path.exists(self.article_id_file):
-                # 检查文件最后修改时间，两周前的记录需要清理
-                file_mod_time = os.path.getmtime(self.article_id_file)
-                two_weeks_ago = (datetime.now() - timedelta(days=14)).timestamp()
-                
-                with open(self.article_id_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        parts = line.strip().split(',')
-                        if len(parts) == 2:
-                            article_id, timestamp = parts
-                            # 只保留两周内的记录
-                            if float(timestamp) >= two_weeks_ago:
-                                article_ids.add(article_id)
-                
-                # 如果清理了旧记录，需要更新文件
-                if len(article_ids) < len(open(self.article_id_file, 'r').readlines()):
-                    with open(self.article_id_file, 'w', encoding='utf-8') as f:
-                        current_timestamp = str(time.time())
-                        for article_id in article_ids:
-                            f.write(f"{article_id},{current_timestamp}\n")
+            if self.store is None:
+                self.store = ArticleIdStore(self.article_id_db, ttl_days=self.ttl_days, legacy_file=self.article_id_file)
+            # 增量清理一批过期记录
+            removed = self.store.compact()
+            if removed:
+                print(f"已清理 {removed} 条过期的文章ID记录")
+            if self.use_seen_filter and self.seen is None:
+                self.seen = self._open_seen_filter()
+            if self.journal is None:
+                # 重放上次运行未提交的记录
+                self.journal = ArticleIdJournal(
+                    self.article_id_db + '.journal',
+                    self.seen if self.seen is not None else self.store,
+                    batch_size=self.journal_batch_size,
+                    # 记录提交后释放认领，避免提交前被其他任务重复认领
+                    on_commit=lambda article_ids: self.store.release_claims(article_ids, self.owner)
+                )
         except Exception as e:
-            print(f"读取文章ID文件时出错: {str(e)}")
-        return article_ids
+            print(f"读取文章ID数据库时出错: {str(e)}")
+        if self.seen is not None:
+            return self.seen
+        return self.store if self.store is not None else set()
     
-    def save_article_id(self, article_id):
+    def claim_article(self, article_id):
+        """认领文章，返回False表示文章已爬取或正被其他任务处理"""
         try:
-            with open(self.article_id_file, 'a', encoding='utf-8') as f:
-                timestamp = str(time.time())
-                f.write(f"{article_id},{timestamp}\n")
+            if self.store is None:
+                self.read_article_ids()
+            return self.store.claim(article_id, self.owner, self.claim_lease_seconds)
         except Exception as e:
-            print(f"保存文章ID时出错: {str(e)}")
\ No newline at end of file
+            print(f"认领文章时出错: {str(e)}")
+            # 数据库不可用时不阻塞爬取
+            return True
+    
+    def record_article(self, article_id, saved=True):
+        """记录文章的最终处理结果，按批写入日志并提交
+        
+        只有saved的文章会被标记为已爬取；失败的文章只写入日志，下次运行会重新处理。
+        调用方应在文章内容和媒体文件都已落盘之后再调用。
+        """
+        try:
+            if self.journal is None:
+                self.read_article_ids()
+            self.journal.record(article_id, STATUS_SAVED if saved else STATUS_FAILED)
+        except Exception as e:
+            print(f"记录文章ID时出错: {str(e)}")
+    
+    def flush(self):
+        """提交缓冲区中的全部记录，并释放本任务尚未处理完的认领"""
+        try:
+            if self.journal is not None:
+                self.journal.close()
+            if self.store is not None:
+                self.store.release_all_claims(self.owner)
+        except Exception as e:
+            print(f"提交文章ID记录时出错: {str(e)}")
+    
+    def close(self):
+        """提交剩余记录并关闭文章ID数据库和布隆过滤器，之后再次使用时重新打开"""
+        self.flush()
+        self.journal = None
+        try:
+            if self.seen is not None:
+                self.seen.bloom.close()
+            if self.store is not None:
+                self.store.close()
+        except Exception as e:
+            print(f"关闭文章ID数据库时出错: {str(e)}")
+        self.seen = None
+        self.store = None
+    
+    def save_article_id(self, article_id):
+        """立即把文章ID标记为已爬取"""
+        self.record_article(article_id, saved=True)
+        self.flush()
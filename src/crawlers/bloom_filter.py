@@ -0,0 +1,215 @@
+import os
+import math
+import mmap
+import struct
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+# 过滤器文件头：魔数、位数组长度(bit)、哈希函数个数
+_HEADER = struct.Struct('<4sQI')
+_MAGIC = b'HCBF'
+# 打开其他进程正在创建的过滤器文件时，等待文件头写入的最长时间（秒）
+CREATE_WAIT_SECONDS = 5
+
+
+class BloomFilter:
+    """基于mmap文件的布隆过滤器
+
+    位数组直接映射到磁盘文件，打开时无需读取和反序列化，新增元素由操作系统写回。
+    """
+
+    def __init__(self, path, capacity, error_rate):
+        """
+        Args:
+            path: 过滤器文件路径，不存在时创建
+            capacity: 预期元素数量
+            error_rate: 预期元素数量下的误判率
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        # 多个进程可能同时创建同一天的桶：只有独占创建成功的进程初始化文件，其余进程打开已有文件
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0))
+        except FileExistsError:
+            fd = None
+        if fd is not None:
+            self._file = os.fdopen(fd, 'r+b')
+            self._initialize(capacity, error_rate)
+        else:
+            self._file = open(path, 'r+b')
+            # 其他进程刚创建文件时，等待其写完文件头
+            deadline = time.time() + CREATE_WAIT_SECONDS
+            while os.fstat(self._file.fileno()).st_size <= _HEADER.size and time.time() < deadline:
+                time.sleep(0.05)
+            if os.fstat(self._file.fileno()).st_size <= _HEADER.size:
+                # 上次创建时中断留下的不完整文件
+                self._initialize(capacity, error_rate)
+            else:
+                magic, self.num_bits, self.num_hashes = _HEADER.unpack(self._file.read(_HEADER.size))
+                if magic != _MAGIC:
+                    self._file.close()
+                    raise ValueError(f"不是有效的布隆过滤器文件: {path}")
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+    def _initialize(self, capacity, error_rate):
+        """按容量和误判率计算参数，写入文件头并分配位数组"""
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(_MAGIC, self.num_bits, self.num_hashes))
+        self._file.truncate(_HEADER.size + (self.num_bits + 7) // 8)
+        self._file.flush()
+
+    def _positions(self, key):
+        """双重哈希生成k个位位置"""
+        digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        h2 |= 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """加入元素"""
+        with self._lock:
+            for pos in self._positions(key):
+                offset = _HEADER.size + (pos >> 3)
+                self._mmap[offset] = self._mmap[offset] | (1 << (pos & 7))
+
+    def __contains__(self, key):
+        """判断元素可能存在（可能误判）或一定不存在"""
+        mm = self._mmap
+        for pos in self._positions(key):
+            if not mm[_HEADER.size + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def flush(self):
+        """把修改写回磁盘"""
+        with self._lock:
+            self._mmap.flush()
+
+    def close(self):
+        """关闭映射和文件"""
+        with self._lock:
+            self._mmap.flush()
+            self._mmap.close()
+            self._file.close()
+
+
+class RotatingBloomFilter:
+    """按天分桶的布隆过滤器，保留最近days天
+
+    新元素写入当天的桶，查询时检查所有未过期的桶，过期的桶文件直接删除。
+    总误判率约为各桶误判率之和，因此每个桶按 error_rate / days 创建。
+    """
+
+    FILE_PREFIX = 'seen_'
+    FILE_SUFFIX = '.bloom'
+
+    def __init__(self, directory, days=90, capacity_per_day=5000, error_rate=0.001):
+        self.directory = directory
+        self.days = max(1, days)
+        self.capacity_per_day = capacity_per_day
+        self.bucket_error_rate = error_rate / self.days
+        self._lock = threading.Lock()
+        # 日期字符串(YYYYMMDD) -> BloomFilter
+        self._buckets = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_buckets()
+
+    def _bucket_path(self, day):
+        return os.path.join(self.directory, f"{self.FILE_PREFIX}{day}{self.FILE_SUFFIX}")
+
+    def _oldest_day(self):
+        return (datetime.now() - timedelta(days=self.days - 1)).strftime('%Y%m%d')
+
+    def _load_buckets(self):
+        """打开未过期的桶，删除过期的桶文件"""
+        oldest = self._oldest_day()
+        for name in os.listdir(self.directory):
+            if not (name.startswith(self.FILE_PREFIX) and name.endswith(self.FILE_SUFFIX)):
+                continue
+            day = name[len(self.FILE_PREFIX):-len(self.FILE_SUFFIX)]
+            path = os.path.join(self.directory, name)
+            if day < oldest:
+                os.remove(path)
+                continue
+            try:
+                self._buckets[day] = BloomFilter(path, self.capacity_per_day, self.bucket_error_rate)
+            except ValueError:
+                os.remove(path)
+
+    @property
+    def is_empty(self):
+        """是否还没有任何桶（首次启用时需要从精确存储预热）"""
+        return not self._buckets
+
+    def _bucket_for(self, day):
+        with self._lock:
+            bucket = self._buckets.get(day)
+            if bucket is None:
+                bucket = BloomFilter(self._bucket_path(day), self.capacity_per_day, self.bucket_error_rate)
+                self._buckets[day] = bucket
+            return bucket
+
+    def add(self, key, timestamp=None):
+        """把元素加入对应日期的桶（默认当天）"""
+        moment = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+        day = moment.strftime('%Y%m%d')
+        if day < self._oldest_day():
+            return
+        self._bucket_for(day).add(key)
+
+    def __contains__(self, key):
+        for bucket in list(self._buckets.values()):
+            if key in bucket:
+                return True
+        return False
+
+    def flush(self):
+        for bucket in list(self._buckets.values()):
+            bucket.flush()
+
+    def close(self):
+        with self._lock:
+            for bucket in self._buckets.values():
+                bucket.close()
+            self._buckets = {}
+
+
+class SeenFilter:
+    """已爬取文章判断：布隆过滤器做快速否定，命中时再查询精确存储确认
+
+    绝大多数候选文章是新文章，布隆过滤器直接判定"不存在"即可，无需访问数据库；
+    布隆过滤器判定"可能存在"时由精确存储给出最终结果，因此不会因误判漏爬文章。
+    """
+
+    def __init__(self, bloom, store):
+        self.bloom = bloom
+        self.store = store
+
+    def __contains__(self, article_id):
+        article_id = str(article_id)
+        if article_id not in self.bloom:
+            return False
+        return article_id in self.store
+
+    def __len__(self):
+        return len(self.store)
+
+    def add(self, article_id, timestamp=None):
+        """同时写入精确存储和布隆过滤器"""
+        self.store.add(article_id, timestamp)
+        self.bloom.add(str(article_id), timestamp)
+        self.bloom.flush()
+
+    def add_many(self, records):
+        """批量写入，records为(article_id, timestamp)列表"""
+        self.store.add_many(records)
+        for article_id, timestamp in records:
+            self.bloom.add(str(article_id), timestamp)
+        self.bloom.flush()
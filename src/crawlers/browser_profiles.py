@@ -0,0 +1,69 @@
+from selenium.webdriver.chrome.options import Options
+
+# 可选的浏览器配置档：full为完整渲染（文章详情页默认），lean为精简抓取（列表发现阶段默认）
+BROWSER_PROFILES = ('full', 'lean')
+
+# 精简模式下通过CDP拦截的资源：图片、音视频、字体
+BLOCKED_RESOURCE_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico', '*.image',
+    '*.mp4', '*.m3u8', '*.ts', '*.flv', '*.mp3',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'
+]
+
+# 精简模式下拦截的广告与统计上报域名
+BLOCKED_HOSTS = [
+    'doubleclick.net', 'googlesyndication.com', 'google-analytics.com',
+    'pangolin-sdk-toutiao.com', 'pangolin-sdk-toutiao-b.com',
+    'mcs.snssdk.com', 'log.snssdk.com', 'mon.zijieapi.com', 'mssdk.bytedance.com',
+    'cnzz.com', 'hm.baidu.com'
+]
+
+
+def build_chrome_options(profile, user_agent, page_load_strategy=None, max_memory_mb=0):
+    """按配置档创建Chrome浏览器配置
+
+    Args:
+        profile: 'full' 或 'lean'
+        user_agent: 浏览器User-Agent
+        page_load_strategy: 页面加载策略，None表示使用Chrome默认值
+        max_memory_mb: lean模式下V8堆内存上限(MB)，0表示不限制
+    """
+    options = Options()
+    options.add_argument("--log-level=3")  # 只显示严重错误
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])  # 禁止日志输出
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_argument(f"user-agent={user_agent}")
+    if page_load_strategy:
+        options.page_load_strategy = page_load_strategy
+
+    if profile == 'lean':
+        options.add_argument("--headless=new")  # 无界面模式
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--mute-audio")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--window-size=1366,2000")
+        # 通过内容设置禁止图片、通知和弹窗
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.popups': 2
+        })
+        if max_memory_mb > 0:
+            options.add_argument(f"--js-flags=--max-old-space-size={int(max_memory_mb)}")
+    return options
+
+
+def apply_resource_blocking(driver, profile, extra_hosts=None):
+    """浏览器启动后，lean模式通过CDP拦截图片、媒体、字体及广告统计请求"""
+    if profile != 'lean':
+        return
+    hosts = BLOCKED_HOSTS + list(extra_hosts or [])
+    patterns = BLOCKED_RESOURCE_PATTERNS + [f"*{host}*" for host in hosts]
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except Exception:
+        # CDP不可用时仍可依靠内容设置禁止图片
+        pass
@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.log_utils import print_to_queue
+
+
+class CrawlPipeline:
+    """分阶段的爬取流水线：发现 → 获取详情页 → 提取 → 下载媒体 → 保存
+
+    各阶段之间通过有界队列连接，每个阶段有独立的并发数。下游阶段处理不过来时，
+    上游的put会阻塞（背压），内存中同时存在的文章数量不会超过各队列容量之和。
+    阶段函数都是阻塞函数，在线程池中执行；发现阶段在单独的线程中运行，
+    每收集到一篇文章就立即送入流水线，媒体下载可以与后续文章的发现同时进行。
+    """
+
+    def __init__(self, crawler, queue_size=5, fetch_workers=2, extract_workers=1, media_workers=3, persist_workers=1):
+        """
+        Args:
+            crawler: ToutiaoCrawler实例，提供各阶段的处理方法
+            queue_size: 每个阶段输入队列的容量
+            fetch_workers: 获取详情页阶段的并发数
+            extract_workers: 内容提取阶段的并发数
+            media_workers: 媒体下载阶段的并发数
+            persist_workers: 保存阶段的并发数
+        """
+        self.crawler = crawler
+        self.queue_size = max(1, queue_size)
+        # (阶段名称, 处理函数, 并发数)
+        self.stages = [
+            ("获取详情页", crawler.fetch_article, max(1, fetch_workers)),
+            ("提取内容", crawler.extract_article, max(1, extract_workers)),
+            ("下载媒体", crawler.download_article_media, max(1, media_workers)),
+            ("保存", crawler.save_article_content, max(1, persist_workers)),
+        ]
+        self.processed_count = 0
+        self._counter = itertools.count(1)
+
+    def run(self, discover):
+        """运行流水线，直到发现阶段结束且所有文章处理完毕
+
+        Args:
+            discover: 阻塞的发现函数，参数为emit(article_id, article_url, article_title)回调
+
+        Returns:
+            成功保存的文章数
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._run(discover))
+        finally:
+            loop.close()
+
+    async def _run(self, discover):
+        loop = asyncio.get_running_loop()
+        workers = 1 + sum(concurrency for _, _, concurrency in self.stages)
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+
+        def emit(article_id, article_url, article_title):
+            """在发现线程中调用，队列满时阻塞发现线程"""
+            job = {
+                'index': next(self._counter),
+                'article_id': article_id,
+                'article_url': article_url,
+                'article_title': article_title
+            }
+            asyncio.run_coroutine_threadsafe(queues[0].put(job), loop).result()
+
+        # 启动各阶段的工作协程
+        stage_tasks = []
+        for i, (name, func, concurrency) in enumerate(self.stages):
+            out_queue = queues[i + 1] if i + 1 < len(queues) else None
+            stage_tasks.append([
+                loop.create_task(self._worker(loop, executor, name, func, queues[i], out_queue))
+                for _ in range(concurrency)
+            ])
+
+        try:
+            # 等待发现阶段结束
+            await loop.run_in_executor(executor, discover, emit)
+
+            # 按阶段顺序排空队列并停止工作协程
+            for queue, tasks in zip(queues, stage_tasks):
+                await queue.join()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for tasks in stage_tasks:
+                for task in tasks:
+                    task.cancel()
+            executor.shutdown(wait=True)
+
+        return self.processed_count
+
+    async def _worker(self, loop, executor, name, func, in_queue, out_queue):
+        """单个阶段的工作协程：取出任务，在线程池中处理，把结果送入下一阶段"""
+        while True:
+            job = await in_queue.get()
+            try:
+                result = await loop.run_in_executor(executor, func, job)
+                if result is None:
+                    continue
+                if out_queue is not None:
+                    # 下游队列满时在此等待，形成背压
+                    await out_queue.put(result)
+                else:
+                    self.processed_count += 1
+            except Exception as e:
+                print_to_queue(f"流水线[{name}]处理文章 {job.get('article_id')} 时发生错误: {e}")
+                self.crawler.discard_fingerprints(job.get('article_id'))
+            finally:
+                in_queue.task_done()
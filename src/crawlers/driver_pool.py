@@ -0,0 +1,175 @@
+import threading
+import queue
+from contextlib import contextmanager
+from selenium import webdriver
+
+from utils.log_utils import print_to_queue
+
+
+class DriverPool:
+    """Chrome浏览器驱动池，复用浏览器实例，避免每篇文章都冷启动一次浏览器"""
+
+    def __init__(self, chrome_service, options_factory, size=2, max_pages=50, max_memory_mb=0, on_create=None, name="浏览器池"):
+        """
+        Args:
+            chrome_service: ChromeDriver服务，为None时使用默认方式启动
+            options_factory: 无参函数，返回新的Chrome Options
+            size: 池中最多同时存在的浏览器数量
+            max_pages: 单个浏览器加载多少个页面后回收重建，0表示不限制
+            max_memory_mb: 页面JS堆内存超过该值(MB)时回收重建，0表示不检查
+            on_create: 浏览器创建后调用的函数，参数为新建的浏览器，用于设置请求拦截等
+            name: 池名称，仅用于日志
+        """
+        self.chrome_service = chrome_service
+        self.options_factory = options_factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.on_create = on_create
+        self.name = name
+
+        # 空闲浏览器队列
+        self._idle = queue.LifoQueue()
+        # 每个浏览器已加载的页面数，键为id(driver)
+        self._page_counts = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_driver(self):
+        """创建新的浏览器实例"""
+        options = self.options_factory()
+        if self.chrome_service:
+            driver = webdriver.Chrome(service=self.chrome_service, options=options)
+        else:
+            driver = webdriver.Chrome(options=options)
+        if self.on_create:
+            try:
+                self.on_create(driver)
+            except Exception:
+                driver.quit()
+                raise
+        self._page_counts[id(driver)] = 0
+        print_to_queue(f"{self.name}: 已启动新浏览器（当前 {self._created}/{self.size}）")
+        return driver
+
+    def _quit_driver(self, driver):
+        """关闭浏览器并释放名额"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._page_counts.pop(id(driver), None)
+            self._created -= 1
+
+    def is_healthy(self, driver):
+        """健康检查：浏览器会话仍可执行脚本"""
+        try:
+            return driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+
+    def _memory_mb(self, driver):
+        """获取当前页面的JS堆内存占用(MB)，不支持时返回0"""
+        try:
+            used = driver.execute_script(
+                "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : 0;"
+            )
+            return (used or 0) / (1024 * 1024)
+        except Exception:
+            return 0
+
+    def _should_recycle(self, driver):
+        """判断浏览器是否达到回收条件"""
+        if self.max_pages > 0 and self._page_counts.get(id(driver), 0) >= self.max_pages:
+            return True
+        if self.max_memory_mb > 0 and self._memory_mb(driver) >= self.max_memory_mb:
+            return True
+        return False
+
+    def acquire(self, timeout=None):
+        """租用一个浏览器，池满且无空闲时阻塞等待"""
+        if self._closed:
+            raise RuntimeError(f"{self.name}已关闭")
+
+        while True:
+            # 优先复用空闲浏览器
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+
+            if driver is None:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._create_driver()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                # 等待其他使用者归还；短间隔轮询，以便浏览器被回收腾出名额时能及时重建
+                wait = 0.5 if timeout is None else min(0.5, timeout)
+                try:
+                    driver = self._idle.get(timeout=wait)
+                except queue.Empty:
+                    if timeout is not None:
+                        timeout -= wait
+                        if timeout <= 0:
+                            raise
+                    continue
+
+            if self.is_healthy(driver):
+                return driver
+            print_to_queue(f"{self.name}: 检测到失效的浏览器，已丢弃")
+            self._quit_driver(driver)
+
+    def release(self, driver, pages=1, broken=False):
+        """归还浏览器
+
+        Args:
+            driver: 要归还的浏览器
+            pages: 本次租用期间加载的页面数
+            broken: 使用过程中出现异常时为True，浏览器将被直接关闭
+        """
+        with self._lock:
+            self._page_counts[id(driver)] = self._page_counts.get(id(driver), 0) + pages
+
+        if self._closed or broken:
+            self._quit_driver(driver)
+            return
+
+        if self._should_recycle(driver):
+            print_to_queue(f"{self.name}: 浏览器达到回收条件，关闭后按需重建")
+            self._quit_driver(driver)
+            return
+
+        self._idle.put(driver)
+
+    @contextmanager
+    def lease(self, timeout=None, pages=1):
+        """以上下文管理器方式租用浏览器，退出时自动归还"""
+        driver = self.acquire(timeout=timeout)
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = not self.is_healthy(driver)
+            raise
+        finally:
+            self.release(driver, pages=pages, broken=broken)
+
+    def close_all(self):
+        """关闭池中所有空闲浏览器，之后归还的浏览器也会被直接关闭"""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit_driver(driver)
+        print_to_queue(f"{self.name}: 已关闭所有浏览器")
@@ -0,0 +1,102 @@
+import json
+import re
+
+# 头条PC端信息流接口地址特征
+FEED_API_PATTERN = re.compile(r'toutiao\.com/api/pc/(list/feed|feed/)')
+
+
+class FeedInterceptor:
+    """通过Chrome性能日志捕获信息流接口的JSON响应，直接构建文章记录
+
+    需要在浏览器配置中开启performance日志（见enable_logging），
+    滚动时页面发起的feed请求会被记录，响应体通过CDP的Network.getResponseBody获取。
+    """
+
+    @staticmethod
+    def enable_logging(options):
+        """在Chrome Options中开启性能（网络）日志"""
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        return options
+
+    def _feed_request_ids(self, driver):
+        """读取并清空性能日志，返回信息流接口响应对应的requestId列表"""
+        request_ids = []
+        for entry in driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            if message.get('method') != 'Network.responseReceived':
+                continue
+            params = message.get('params', {})
+            response = params.get('response', {})
+            if FEED_API_PATTERN.search(response.get('url', '')) and 'json' in response.get('mimeType', ''):
+                request_ids.append(params.get('requestId'))
+        return request_ids
+
+    def drain(self, driver):
+        """丢弃目前为止的性能日志（切换频道前调用，避免把上一个频道的数据算到新频道）"""
+        try:
+            driver.get_log('performance')
+        except Exception:
+            pass
+
+    def collect(self, driver):
+        """收集上次调用以来新到达的信息流数据
+
+        Returns:
+            文章记录列表，每条记录包含id、title、url、publish_time及各项计数
+        """
+        records = []
+        try:
+            request_ids = self._feed_request_ids(driver)
+        except Exception:
+            return records
+
+        for request_id in request_ids:
+            try:
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                payload = json.loads(body.get('body', ''))
+            except Exception:
+                # 响应体可能已被浏览器回收，跳过
+                continue
+            records.extend(self.parse_feed(payload))
+        return records
+
+    def parse_feed(self, payload):
+        """将信息流接口的JSON数据转换为文章记录"""
+        records = []
+        items = payload.get('data') if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            return records
+
+        for item in items:
+            # 部分接口把卡片内容序列化在content字段中
+            if isinstance(item, dict) and isinstance(item.get('content'), str):
+                try:
+                    item = json.loads(item['content'])
+                except ValueError:
+                    continue
+            if not isinstance(item, dict):
+                continue
+
+            article_id = str(item.get('item_id') or item.get('group_id') or '')
+            title = item.get('title') or ''
+            if not article_id.isdigit() or not title:
+                continue
+            # 只保留图文文章，视频、微头条等卡片没有/article/详情页
+            if item.get('has_video') or item.get('cell_type') not in (None, 0):
+                continue
+
+            records.append({
+                'id': article_id,
+                'title': title,
+                'url': f"https://www.toutiao.com/article/{article_id}/",
+                'publish_time': item.get('publish_time') or item.get('behot_time'),
+                'read_count': item.get('read_count', 0),
+                'comment_count': item.get('comment_count', 0),
+                'digg_count': item.get('digg_count', 0),
+                'share_count': item.get('share_count', 0),
+                'source': item.get('source') or item.get('media_name', '')
+            })
+        return records
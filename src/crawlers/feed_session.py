@@ -0,0 +1,19 @@
+class FeedSession:
+    """单个浏览器上的信息流抓取状态
+
+    每个浏览器（串行模式下的主浏览器，或并发模式下每个频道的浏览器）各持有一个会话，
+    使卡片水位线和候选缓冲区互不干扰。
+    """
+
+    def __init__(self, driver, waiter):
+        self.driver = driver
+        self.waiter = waiter
+        # 已提取过的卡片数量（水位线）
+        self.watermark = 0
+        # 已提取但尚未使用的候选文章
+        self.buffer = []
+
+    def reset(self):
+        """切换频道后重置卡片水位线和候选缓冲区"""
+        self.watermark = 0
+        self.buffer = []
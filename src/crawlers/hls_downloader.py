@@ -0,0 +1,245 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import subprocess
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+# 流式写入的分块大小
+CHUNK_SIZE = 256 * 1024
+# 主播放列表最多嵌套层数
+MAX_PLAYLIST_DEPTH = 3
+
+_ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def is_playlist_url(url):
+    """地址是否为HLS播放列表"""
+    return urlsplit(url).path.lower().endswith('.m3u8')
+
+
+def parse_attributes(value):
+    """解析 #EXT-X-...: 后的属性列表"""
+    return {key: val.strip('"') for key, val in _ATTRIBUTE_PATTERN.findall(value)}
+
+
+class HlsPlaylist:
+    """解析后的媒体播放列表"""
+
+    def __init__(self, url, segments, init_segment=None, encrypted=False):
+        self.url = url
+        # 分片的绝对地址，按播放顺序
+        self.segments = segments
+        # fMP4分片的初始化段（#EXT-X-MAP），TS分片时为None
+        self.init_segment = init_segment
+        self.encrypted = encrypted
+
+    @property
+    def extension(self):
+        """直接拼接分片得到的文件格式：TS分片为ts，fMP4分片为mp4"""
+        return 'mp4' if self.init_segment else 'ts'
+
+
+class HlsDownloader:
+    """HLS(m3u8)视频下载器
+
+    解析播放列表（主播放列表选择码率最高的变体），用有界线程池并发下载分片，
+    再按顺序直接拼接为一个文件，不重新编码。TS分片拼接后仍是合法的TS文件，
+    本机有ffmpeg时再无损封装（-c copy）为mp4；fMP4分片拼接初始化段后即为mp4。
+    未完成的分片保存在partial_dir中（按播放列表地址命名，不随文章目录变化），因此下次运行也能续传。
+    """
+
+    def __init__(self, session, rate_limiter, partial_dir, workers=4, max_retries=3, timeout=30, remux=True,
+                 stale_days=7):
+        """
+        Args:
+            session: 共用的requests.Session
+            rate_limiter: 按主机限速器
+            partial_dir: 未完成分片的保存目录
+            workers: 同时下载的分片数
+            max_retries: 每个分片的重试次数
+            timeout: 请求超时时间（秒）
+            remux: TS拼接结果是否用ffmpeg封装为mp4（没有ffmpeg时保留ts）
+            stale_days: 超过该天数未更新的未完成分片会被清理
+        """
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.partial_dir = partial_dir
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.remux = remux
+
+        os.makedirs(partial_dir, exist_ok=True)
+        self._remove_stale(stale_days)
+
+    def _remove_stale(self, stale_days):
+        """清理长时间未更新的分片目录"""
+        cutoff = time.time() - stale_days * 24 * 3600
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            try:
+                if name.endswith('.segments') and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def _segment_dir(self, playlist_url):
+        """按媒体播放列表地址（不含查询参数，签名参数会变化）确定分片目录"""
+        parts = urlsplit(playlist_url)
+        key = hashlib.sha1(f"{parts.netloc}{parts.path}".encode('utf-8')).hexdigest()
+        return os.path.join(self.partial_dir, key + '.segments')
+
+    def _get(self, url, stream=False):
+        return self.rate_limiter.request(
+            self.session, 'GET', url, max_retries=self.max_retries, stream=stream, timeout=self.timeout
+        )
+
+    def resolve(self, url, depth=0):
+        """获取并解析播放列表，主播放列表递归解析码率最高的变体，失败时返回None"""
+        response = self._get(url)
+        if response.status_code != 200:
+            print(f"  获取播放列表失败，状态码: {response.status_code}")
+            return None
+        text = response.text
+        if not text.lstrip().startswith('#EXTM3U'):
+            print("  不是有效的m3u8播放列表")
+            return None
+
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+        # 主播放列表：选择带宽最高的变体
+        variants = []
+        for i, line in enumerate(lines):
+            if line.startswith('#EXT-X-STREAM-INF:') and i + 1 < len(lines) and not lines[i + 1].startswith('#'):
+                bandwidth = parse_attributes(line.split(':', 1)[1]).get('BANDWIDTH', '0')
+                variants.append((int(bandwidth) if bandwidth.isdigit() else 0, urljoin(url, lines[i + 1])))
+        if variants:
+            if depth >= MAX_PLAYLIST_DEPTH:
+                print("  播放列表嵌套层数过多")
+                return None
+            variants.sort(key=lambda variant: variant[0], reverse=True)
+            return self.resolve(variants[0][1], depth + 1)
+
+        # 媒体播放列表
+        segments = []
+        init_segment = None
+        encrypted = False
+        for line in lines:
+            if line.startswith('#EXT-X-KEY:'):
+                method = parse_attributes(line.split(':', 1)[1]).get('METHOD', 'NONE')
+                if method != 'NONE':
+                    encrypted = True
+            elif line.startswith('#EXT-X-MAP:'):
+                uri = parse_attributes(line.split(':', 1)[1]).get('URI')
+                if uri:
+                    init_segment = urljoin(url, uri)
+            elif not line.startswith('#'):
+                segments.append(urljoin(url, line))
+        return HlsPlaylist(url, segments, init_segment, encrypted)
+
+    def _download_segment(self, url, path):
+        """下载单个分片到path，已存在（上次运行已下载）时跳过"""
+        if os.path.exists(path):
+            return True
+        part_path = path + '.part'
+        try:
+            with self._get(url, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"  分片下载失败，状态码: {response.status_code}")
+                    return False
+                expected = int(response.headers.get('Content-Length') or 0)
+                size = 0
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            size += len(chunk)
+            if expected and size != expected:
+                print(f"  分片大小校验失败: {size}/{expected} 字节")
+                os.remove(part_path)
+                return False
+            os.replace(part_path, path)
+            return True
+        except Exception as e:
+            print(f"  分片下载失败: {str(e)}")
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            return False
+
+    def download(self, url, save_base):
+        """下载播放列表对应的视频
+
+        Args:
+            url: m3u8播放列表地址
+            save_base: 保存路径（不含扩展名），扩展名由分片格式决定
+
+        Returns:
+            保存的文件路径，失败时返回None
+        """
+        try:
+            playlist = self.resolve(url)
+        except Exception as e:
+            print(f"  解析播放列表失败: {str(e)}")
+            return None
+        if playlist is None or not playlist.segments:
+            return None
+        if playlist.encrypted:
+            print("  播放列表已加密，暂不支持下载")
+            return None
+
+        # 分片先保存在媒体目录下的.partial中，中断后再次下载时已完成的分片不再重复下载
+        segment_dir = self._segment_dir(playlist.url)
+        os.makedirs(segment_dir, exist_ok=True)
+        jobs = []
+        if playlist.init_segment:
+            jobs.append((playlist.init_segment, os.path.join(segment_dir, 'init')))
+        for i, segment_url in enumerate(playlist.segments):
+            jobs.append((segment_url, os.path.join(segment_dir, f"{i:05d}")))
+        print(f"  开始下载HLS视频，共 {len(playlist.segments)} 个分片")
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            results = list(executor.map(lambda job: self._download_segment(*job), jobs))
+        if not all(results):
+            print(f"  HLS视频下载不完整: {sum(results)}/{len(jobs)} 个分片")
+            return None
+
+        # 按顺序拼接分片，不重新编码
+        save_path = f"{save_base}.{playlist.extension}"
+        part_path = save_path + '.part'
+        with open(part_path, 'wb') as out:
+            for _, path in jobs:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, out, CHUNK_SIZE)
+        os.replace(part_path, save_path)
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+        if playlist.extension == 'ts' and self.remux:
+            save_path = self.remux_to_mp4(save_path)
+        return save_path
+
+    @staticmethod
+    def remux_to_mp4(ts_path):
+        """用ffmpeg把TS无损封装为mp4，没有ffmpeg或封装失败时返回原路径"""
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            return ts_path
+        mp4_path = os.path.splitext(ts_path)[0] + '.mp4'
+        try:
+            subprocess.run(
+                [ffmpeg, '-y', '-loglevel', 'error', '-i', ts_path, '-c', 'copy', mp4_path],
+                check=True, timeout=600
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"  封装为mp4失败，保留ts文件: {str(e)}")
+            try:
+                os.remove(mp4_path)
+            except OSError:
+                pass
+            return ts_path
+        os.remove(ts_path)
+        return mp4_path
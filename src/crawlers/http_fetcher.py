@@ -0,0 +1,96 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.config_manager import ConfigManager
+from utils.rate_limiter import get_rate_limiter
+from utils.http_cache import get_http_cache
+
+
+class HttpFetcher:
+    """基于requests连接池的页面获取器，优先用HTTP直接获取文章详情页"""
+
+    def __init__(self, user_agent=None, cookies=None, timeout=None, pool_size=10):
+        """
+        Args:
+            user_agent: 请求使用的User-Agent，默认取配置管理器中的值
+            cookies: Cookie字符串（如 "a=1; b=2"）或字典，默认取配置中的crawler.cookies
+            timeout: 请求超时时间（秒），默认取配置中的crawler.timeout
+            pool_size: 每个会话的连接池大小
+        """
+        self.config_manager = ConfigManager()
+        crawler_config = self.config_manager.get('crawler', {})
+
+        self.user_agent = user_agent or self.config_manager.user_agent
+        self.timeout = timeout or crawler_config.get('timeout', 30)
+        self.pool_size = pool_size
+        self.cookies = self._parse_cookies(cookies if cookies is not None else crawler_config.get('cookies', ''))
+
+        self.max_retries = crawler_config.get('max_retries', 3)
+        self.rate_limiter = get_rate_limiter()
+        # 页面响应写入磁盘缓存，重新运行时带ETag/Last-Modified验证，未变化的页面不再下载
+        self.http_cache = get_http_cache()
+
+        # requests.Session不是线程安全的，每个线程持有一个会话
+        self._local = threading.local()
+
+    @staticmethod
+    def _parse_cookies(cookies):
+        """将Cookie字符串解析为字典"""
+        if not cookies:
+            return {}
+        if isinstance(cookies, dict):
+            return dict(cookies)
+        result = {}
+        for part in str(cookies).split(';'):
+            if '=' in part:
+                name, value = part.split('=', 1)
+                result[name.strip()] = value.strip()
+        return result
+
+    @property
+    def session(self):
+        """获取当前线程的会话，首次使用时创建"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': self.user_agent,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'zh-CN,zh;q=0.9',
+                'Referer': 'https://www.toutiao.com/'
+            })
+            session.cookies.update(self.cookies)
+            self._local.session = session
+        return session
+
+    def get_html(self, url):
+        """请求页面并返回HTML文本，失败时返回None"""
+        try:
+            if self.http_cache is not None:
+                response = self.http_cache.request(
+                    self.rate_limiter, self.session, url, max_retries=self.max_retries, timeout=self.timeout
+                )
+            else:
+                response = self.rate_limiter.request(
+                    self.session, 'GET', url, max_retries=self.max_retries, timeout=self.timeout
+                )
+            # 未写入缓存的临时文件在关闭响应时删除
+            with response:
+                if response.status_code != 200:
+                    return None
+                if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+                    response.encoding = response.apparent_encoding or 'utf-8'
+                return response.text
+        except Exception:
+            return None
+
+    def close(self):
+        """关闭当前线程的会话"""
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            session.close()
+            self._local.session = None
@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# 多个爬虫进程共用一个日志文件，追加和清空日志时需要进程间的文件锁
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# 文章处理结果状态
+STATUS_SAVED = 'saved'
+STATUS_FAILED = 'failed'
+
+
+class ArticleIdJournal:
+    """文章ID的写后日志（write-behind journal）
+
+    文章处理完成后把(文章ID, 最终状态)放入缓冲区，攒够一批后一次性追加到日志文件，
+    每批只调用一次fsync，然后把状态为saved的ID批量写入ID存储。
+    进程在两次刷新之间崩溃时，日志中已落盘的记录会在下次启动时重放到存储中；
+    尚未落盘的文章不会被标记为已爬取，下次运行会重新处理。
+    多个进程并发运行时，追加并提交一批记录、重放并清空日志都在文件锁内进行，
+    清空日志时不会丢失其他进程已追加但尚未提交的记录。
+    """
+
+    def __init__(self, journal_file, store, batch_size=20, on_commit=None):
+        """
+        Args:
+            journal_file: 日志文件路径
+            store: 文章ID存储，需提供add_many([(article_id, timestamp), ...])
+            batch_size: 缓冲多少条记录后自动刷新
+            on_commit: 每批提交到存储后调用的函数，参数为该批的文章ID列表
+        """
+        self.journal_file = journal_file
+        self.lock_file = journal_file + '.lock'
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.on_commit = on_commit
+        self._buffer = []
+        self._lock = threading.Lock()
+        self.replay()
+
+    @contextmanager
+    def _process_lock(self):
+        """进程间互斥的文件锁"""
+        with open(self.lock_file, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def replay(self, verbose=True):
+        """把日志中已落盘的saved记录重放到存储中，然后清空日志
+
+        日志中可能有其他进程崩溃前未提交的记录，重放后才能清空。
+        """
+        with self._lock, self._process_lock():
+            return self._replay(verbose)
+
+    def _replay(self, verbose):
+        if not os.path.exists(self.journal_file):
+            return 0
+        records = []
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.strip().split(',')
+                if len(parts) != 3 or parts[1] != STATUS_SAVED:
+                    continue
+                try:
+                    records.append((parts[0], float(parts[2])))
+                except ValueError:
+                    continue
+        if records:
+            self.store.add_many(records)
+        if records and verbose:
+            print(f"已从日志恢复 {len(records)} 条文章ID记录")
+        # 记录已进入存储，日志可以清空
+        with open(self.journal_file, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        return len(records)
+
+    def record(self, article_id, status):
+        """记录文章的最终处理状态，缓冲区满时自动刷新"""
+        with self._lock:
+            self._buffer.append((str(article_id), status, time.time()))
+            should_flush = len(self._buffer) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的记录追加到日志并fsync一次，再批量提交到存储"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            lines = ''.join(f"{article_id},{status},{timestamp}\n" for article_id, status, timestamp in batch)
+            saved = [(article_id, timestamp) for article_id, status, timestamp in batch if status == STATUS_SAVED]
+            # 追加和提交在同一个文件锁内，其他进程清空日志时这批记录已进入存储
+            with self._process_lock():
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if saved:
+                    self.store.add_many(saved)
+            if self.on_commit:
+                self.on_commit([article_id for article_id, _, _ in batch])
+        return len(batch)
+
+    def close(self):
+        """刷新剩余记录，重放日志中其他进程遗留的记录后清空日志"""
+        self.flush()
+        self.replay(verbose=False)
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import threading
+
+# Pillow和NumPy为可选依赖：没有Pillow时不计算感知哈希，没有NumPy时使用逐个比较的查询
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 每次批量比较的索引分块大小，限制查询时的临时内存
+QUERY_BLOCK_SIZE = 65536
+# 感知哈希相近的图片还需宽高比相差不超过该比例才视为同一图片（缩放不改变宽高比，裁剪会改变）
+ASPECT_RATIO_TOLERANCE = 0.02
+
+
+def dhash(path, hash_size=8):
+    """计算图片的64位差值哈希(dHash)，重新编码、缩放后的相同图片哈希相近
+
+    Raises:
+        RuntimeError: 未安装Pillow
+    """
+    if Image is None:
+        raise RuntimeError("计算感知哈希需要安装Pillow")
+    with Image.open(path) as image:
+        pixels = list(image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def image_size(path):
+    """读取图片的(宽, 高)，只解析文件头
+
+    Raises:
+        RuntimeError: 未安装Pillow
+    """
+    if Image is None:
+        raise RuntimeError("读取图片尺寸需要安装Pillow")
+    with Image.open(path) as image:
+        return image.size
+
+
+def same_aspect_ratio(size, other_size, tolerance=ASPECT_RATIO_TOLERANCE):
+    """两张图片的宽高比是否在容差范围内一致"""
+    (width, height), (other_width, other_height) = size, other_size
+    if not (width and height and other_width and other_height):
+        return False
+    ratio, other_ratio = width / height, other_width / other_height
+    return abs(ratio - other_ratio) <= tolerance * max(ratio, other_ratio)
+
+
+def _to_signed(value):
+    """SQLite的INTEGER为有符号64位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class ImageHashIndex:
+    """图片感知哈希索引
+
+    哈希保存在SQLite中，启动时载入为NumPy uint64数组；批量查询时对整个数组做异或，
+    再用字节查表统计汉明距离，数十万张图片的查询也只需几次向量运算。
+    未安装NumPy时退化为逐个比较。
+    """
+
+    def __init__(self, db_file, max_distance=2):
+        """
+        Args:
+            db_file: SQLite数据库文件路径
+            max_distance: 汉明距离不超过该值视为相同图片
+        """
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_hashes (path TEXT PRIMARY KEY, hash INTEGER NOT NULL)"
+        )
+
+        # 启动时不逐个检查文件是否存在，查询命中已删除的文件时再从索引中移除
+        rows = self._conn.execute("SELECT path, hash FROM image_hashes").fetchall()
+        self._paths = [path for path, _ in rows]
+        hashes = [value & 0xFFFFFFFFFFFFFFFF for _, value in rows]
+        # 路径 -> 在数组中的位置
+        self._positions = {path: i for i, path in enumerate(self._paths)}
+
+        if np is not None:
+            self._hashes = np.array(hashes, dtype=np.uint64)
+            self._popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+        else:
+            self._hashes = hashes
+
+    def __len__(self):
+        return len(self._paths)
+
+    def query(self, values):
+        """批量查询，返回与values等长的列表，每项为(已有图片路径, 汉明距离)或None
+
+        命中的文件已不存在时把它从索引中移除并重新查询。
+        """
+        with self._lock:
+            while True:
+                results = self._query(values)
+                missing = {result[0] for result in results if result and not os.path.exists(result[0])}
+                if not missing:
+                    return results
+                self._remove(missing)
+
+    def _query(self, values):
+        if np is None:
+            return [self._query_python(value) for value in values]
+        results = [None] * len(values)
+        if not values:
+            return results
+        queries = np.array(values, dtype=np.uint64)
+        for start in range(0, len(self._hashes), QUERY_BLOCK_SIZE):
+            block = self._hashes[start:start + QUERY_BLOCK_SIZE]
+            # (查询数, 分块大小)的异或矩阵，统计置位数（旧版NumPy没有bitwise_count时按字节查表）
+            xor = np.bitwise_xor(queries[:, None], block[None, :])
+            if hasattr(np, 'bitwise_count'):
+                distances = np.bitwise_count(xor)
+            else:
+                distances = self._popcount[xor.view(np.uint8)].reshape(len(values), len(block), 8).sum(axis=2)
+            best = distances.argmin(axis=1)
+            for i, index in enumerate(best):
+                distance = int(distances[i, index])
+                if distance <= self.max_distance and (results[i] is None or distance < results[i][1]):
+                    results[i] = (self._paths[start + int(index)], distance)
+        return results
+
+    def _query_python(self, value):
+        best = None
+        for path, other in zip(self._paths, self._hashes):
+            distance = bin(value ^ other).count('1')
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (path, distance)
+        return best
+
+    def _remove(self, paths):
+        """从数据库和内存数组中移除图片"""
+        self._conn.executemany("DELETE FROM image_hashes WHERE path = ?", [(path,) for path in paths])
+        keep = [i for i, path in enumerate(self._paths) if path not in paths]
+        self._paths = [self._paths[i] for i in keep]
+        if np is not None:
+            self._hashes = self._hashes[np.array(keep, dtype=np.int64)]
+        else:
+            self._hashes = [self._hashes[i] for i in keep]
+        self._positions = {path: i for i, path in enumerate(self._paths)}
+
+    def add_many(self, items):
+        """批量加入图片，items为(路径, 哈希)列表；已在索引中的路径更新哈希"""
+        # 同一路径只保留最后一项，与数据库中INSERT OR REPLACE的结果一致
+        items = list(dict(items).items())
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_hashes (path, hash) VALUES (?, ?)",
+                [(path, _to_signed(value)) for path, value in items]
+            )
+            new_values = []
+            for path, value in items:
+                position = self._positions.get(path)
+                if position is not None:
+                    self._hashes[position] = value
+                    continue
+                self._positions[path] = len(self._paths)
+                self._paths.append(path)
+                new_values.append(value)
+            if not new_values:
+                return
+            if np is not None:
+                self._hashes = np.concatenate([self._hashes, np.array(new_values, dtype=np.uint64)])
+            else:
+                self._hashes.extend(new_values)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
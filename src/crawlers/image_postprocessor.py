@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Pillow为可选依赖，未安装时不启用图片后处理
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+    features = None
+
+# 各格式保存时的参数
+FORMAT_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'avif': {'format': 'AVIF'},
+}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def supported_formats(formats):
+    """过滤掉当前Pillow不支持的输出格式"""
+    if features is None:
+        return []
+    return [fmt for fmt in formats if fmt in FORMAT_OPTIONS and features.check(fmt)]
+
+
+def _is_fresh(output_path, source_mtime):
+    """输出文件已存在且不早于源文件时无需重新生成"""
+    try:
+        return os.path.getmtime(output_path) >= source_mtime
+    except OSError:
+        return False
+
+
+def render_derivatives(source_path, output_dir, thumbnail_size=320, formats=('webp',), quality=75):
+    """为一张图片生成缩略图和压缩副本（在子进程中执行）
+
+    已存在且不早于源文件的输出会被跳过，重复执行不会重复处理。
+
+    Returns:
+        {'width', 'height', 'thumbnail', 格式名: 路径...}，路径相对于output_dir
+    """
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    source_mtime = os.path.getmtime(source_path)
+    targets = {'thumbnail': os.path.join(output_dir, 'thumbs', f"{name}.webp")}
+    for fmt in formats:
+        targets[fmt] = os.path.join(output_dir, fmt, f"{name}.{fmt}")
+
+    pending = {key: path for key, path in targets.items() if not _is_fresh(path, source_mtime)}
+    with Image.open(source_path) as image:
+        width, height = image.size
+        if pending:
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for key, path in pending.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if key == 'thumbnail':
+                    output = image.copy()
+                    output.thumbnail((thumbnail_size, thumbnail_size))
+                    options = dict(FORMAT_OPTIONS['webp'])
+                else:
+                    output = image
+                    options = dict(FORMAT_OPTIONS[key])
+                # 先写临时文件再重命名，中断时不会留下不完整的输出
+                part_path = path + '.part'
+                output.save(part_path, quality=quality, **options)
+                os.replace(part_path, path)
+
+    result = {'width': width, 'height': height}
+    for key, path in targets.items():
+        result[key] = os.path.relpath(path, output_dir)
+    return result
+
+
+class ImagePostProcessor:
+    """图片后处理阶段：在进程池中生成缩略图和WebP/AVIF压缩副本
+
+    图片解码和编码是CPU密集型操作，放在独立进程中执行，不占用爬取线程的GIL。
+    submit立即返回；同时排队的图片数超过max_pending时submit阻塞（有界队列）。
+    缩略图保存在images/thumbs，压缩副本保存在images/<格式>；
+    每篇文章的图片全部处理完后，结果写入该文章images目录下的manifest.json。
+    """
+
+    def __init__(self, workers=0, max_pending=32, thumbnail_size=320, formats=('webp',), quality=75):
+        """
+        Args:
+            workers: 进程数，0表示CPU核数
+            max_pending: 同时排队和处理中的图片数上限
+            thumbnail_size: 缩略图最长边（像素）
+            formats: 压缩副本的格式，支持webp、avif（取决于Pillow）
+            quality: 输出质量
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.thumbnail_size = thumbnail_size
+        self.formats = tuple(supported_formats(formats))
+        self.quality = quality
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._executor = None
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 爬虫进程中有浏览器、限速器和数据库等线程，在多线程进程中fork可能使子进程卡在继承的锁上，
+                # 因此使用spawn启动子进程
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def submit(self, image_paths, images_dir):
+        """提交一篇文章的图片，处理完成后写入images_dir下的manifest.json"""
+        if not image_paths:
+            return
+        state = {'remaining': len(image_paths), 'entries': {}}
+        state_lock = threading.Lock()
+
+        def on_done(future, image_path):
+            self._slots.release()
+            name = os.path.basename(image_path)
+            try:
+                entry = future.result()
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                entry = {'error': str(e)}
+                with self._lock:
+                    self.failed += 1
+            with state_lock:
+                state['entries'][name] = entry
+                state['remaining'] -= 1
+                finished = state['remaining'] == 0
+            if finished:
+                self._write_manifest(images_dir, state['entries'])
+
+        for image_path in image_paths:
+            # 队列已满时在此等待
+            self._slots.acquire()
+            try:
+                future = self.executor.submit(
+                    render_derivatives, image_path, images_dir, self.thumbnail_size, self.formats, self.quality
+                )
+            except Exception:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda f, path=image_path: on_done(f, path))
+
+    @staticmethod
+    def _write_manifest(images_dir, entries):
+        """合并写入manifest.json（原子替换）"""
+        manifest_path = os.path.join(images_dir, MANIFEST_NAME)
+        manifest = {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+        manifest.update(entries)
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(manifest.items())), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def close(self):
+        """等待所有图片处理完毕并关闭进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+            print(f"图片后处理完成: 成功 {self.processed} 张，失败 {self.failed} 张")
+
+
+def benchmark(count=200, size=(1600, 1200), workers=0):
+    """生成合成图片并测量处理速度，返回(每秒图片数, 每核每秒图片数)"""
+    processor = ImagePostProcessor(workers=workers, max_pending=count)
+    work_dir = tempfile.mkdtemp()
+    try:
+        images_dir = os.path.join(work_dir, 'images')
+        os.makedirs(images_dir)
+        source = Image.effect_noise(size, 64).convert('RGB')
+        paths = []
+        for i in range(count):
+            path = os.path.join(images_dir, f"image_{i + 1}.jpg")
+            source.save(path, quality=90)
+            paths.append(path)
+
+        start = time.perf_counter()
+        processor.submit(paths, images_dir)
+        processor.close()
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed
+        return rate, rate / processor.workers
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # 基准测试：python src/crawlers/image_postprocessor.py [图片数] [进程数]
+    if Image is None:
+        print("未安装Pillow，无法运行基准测试")
+        sys.exit(1)
+    image_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    worker_count = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    total_rate, per_core = benchmark(image_count, workers=worker_count)
+    print(f"{total_rate:.1f} 张/秒，每核 {per_core:.1f} 张/秒")
@@ -0,0 +1,132 @@
+import re
+from urllib.parse import urlsplit
+
+# 头条图片CDN（p1~p99-sign.toutiaoimg.com、p3.pstatp.com等）
+TOUTIAO_IMAGE_HOSTS = ('toutiaoimg.com', 'pstatp.com', 'bytedance.net', 'byteimg.com')
+
+# 表示原图的处理后缀
+_ORIGINAL_MARKERS = ('origin', 'noop', 'obj')
+# 后缀中的尺寸，如 tplv-tt-shrink:640:0、~750x0、~640x0:q75
+_SIZE_PATTERN = re.compile(r'(?:^|[:~_-])(\d{2,5})[x:](\d{1,5})')
+# 占位图和统计像素的文件名特征（只匹配路径最后一段中以.-_分隔的完整单词，避免图片key中的字符误判）
+_PLACEHOLDER_PATTERN = re.compile(
+    r'(?:^|[._-])(?:placeholder|pixel|beacon|track(?:ing)?|spacer)(?:[._-]|$)'
+    r'|(?:^|[._-])(?:blank\.gif|loading\.(?:gif|svg|png))(?:[~?]|$)',
+    re.I
+)
+
+
+def _host_family(host):
+    """把同一CDN的不同节点（p1/p3/p26-sign等）归为同一主机"""
+    host = host.lower()
+    for family in TOUTIAO_IMAGE_HOSTS:
+        if host == family or host.endswith('.' + family):
+            return family
+    return host
+
+
+def _split_variant(path):
+    """把路径拆分为图片本身和处理后缀（~tplv-...），返回(基础路径, 后缀)"""
+    base, _, suffix = path.partition('~')
+    return base, suffix
+
+
+def canonical_image_key(url):
+    """图片的规范标识：忽略CDN节点、处理后缀和签名参数，同一张图片的不同尺寸/格式得到相同结果"""
+    parts = urlsplit(url)
+    host = _host_family(parts.netloc)
+    if host in TOUTIAO_IMAGE_HOSTS:
+        base, _ = _split_variant(parts.path)
+        return f"{host}{base}"
+    return f"{host}{parts.path}?{parts.query}" if parts.query else f"{host}{parts.path}"
+
+
+def image_cache_key(url):
+    """图片某个尺寸/格式的标识：保留处理后缀，忽略CDN节点和会变化的签名参数"""
+    parts = urlsplit(url)
+    host = _host_family(parts.netloc)
+    if host in TOUTIAO_IMAGE_HOSTS:
+        return f"{host}{parts.path}"
+    return f"{host}{parts.path}?{parts.query}" if parts.query else f"{host}{parts.path}"
+
+
+def variant_width(url):
+    """图片变体的宽度：原图返回inf，无法判断时返回None"""
+    _, suffix = _split_variant(urlsplit(url).path)
+    if not suffix:
+        return float('inf')
+    lowered = suffix.lower()
+    if any(marker in lowered for marker in _ORIGINAL_MARKERS):
+        return float('inf')
+    match = _SIZE_PATTERN.search(lowered)
+    if match and int(match.group(1)) > 0:
+        return int(match.group(1))
+    return None
+
+
+def is_placeholder(url, tag=None):
+    """是否为占位图、内嵌数据或统计像素"""
+    if not url or url.startswith(('data:', 'blob:', 'about:')):
+        return True
+    path = urlsplit(url).path
+    if _PLACEHOLDER_PATTERN.search(path.rsplit('/', 1)[-1]):
+        return True
+    if path.lower().endswith('.svg'):
+        return True
+    if tag is not None:
+        # 1x1等极小尺寸的图片为统计像素
+        for attr in ('width', 'height'):
+            value = str(tag.get(attr) or '').strip().rstrip('px')
+            if value.isdigit() and int(value) <= 2:
+                return True
+    return False
+
+
+def choose_variant(urls, max_width=0):
+    """从同一图片的多个变体中选择要下载的一个
+
+    Args:
+        urls: 同一图片的变体地址
+        max_width: 0表示选择原图（或尺寸最大的变体）；大于0时选择宽度不超过该值的最大变体，
+            没有时选择超过该值的最小变体，仍没有时选择原图
+    """
+    sized = [(variant_width(url), url) for url in urls]
+    if max_width > 0:
+        within = [(width, url) for width, url in sized if width is not None and width <= max_width]
+        if within:
+            return max(within, key=lambda item: item[0])[1]
+        above = [(width, url) for width, url in sized if width is not None and width != float('inf')]
+        if above:
+            return min(above, key=lambda item: item[0])[1]
+    # 原图优先，其次是无法判断尺寸的变体，最后按宽度
+    return max(sized, key=lambda item: (
+        2 if item[0] == float('inf') else (1 if item[0] is None else 0),
+        item[0] if isinstance(item[0], int) else 0
+    ))[1]
+
+
+def select_image_urls(img_tags, max_width=0):
+    """从文章的<img>标签中选出要下载的图片地址
+
+    收集src、data-src、srcset中的地址，去掉占位图和统计像素，按规范标识合并同一图片的变体，
+    每张图片只保留一个变体，按在文章中首次出现的顺序返回。
+    """
+    variants = {}
+    for tag in img_tags:
+        candidates = [tag.get('src'), tag.get('data-src'), tag.get('data-original')]
+        srcset = tag.get('srcset') or tag.get('data-srcset')
+        if srcset:
+            candidates.extend(item.strip().split(' ')[0] for item in srcset.split(','))
+        for url in candidates:
+            if not url:
+                continue
+            url = url.strip()
+            if url.startswith('//'):
+                url = 'https:' + url
+            if not url.startswith(('http://', 'https://')) or is_placeholder(url, tag):
+                continue
+            key = canonical_image_key(url)
+            urls = variants.setdefault(key, [])
+            if url not in urls:
+                urls.append(url)
+    return [choose_variant(urls, max_width) for urls in variants.values()]
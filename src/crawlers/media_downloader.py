@@ -1,9 +1,66 @@
 import requests
 import os
 import re
-from bs4 import BeautifulSoup
+import base64
+import hashlib
 import time
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
 from config.config_manager import ConfigManager
+from crawlers.video_downloader import RangedDownloader
+from crawlers.hls_downloader import HlsDownloader, is_playlist_url
+from crawlers.media_store import MediaStore
+from crawlers.image_urls import image_cache_key
+from crawlers.image_hash_index import ImageHashIndex, dhash, image_size, same_aspect_ratio, Image
+from utils.rate_limiter import get_rate_limiter
+from utils.http_cache import get_http_cache
+
+# 流式下载的分块大小
+CHUNK_SIZE = 64 * 1024
+
+# 读取响应内容时可以重试的错误：连接中断、分块传输不完整、读取超时
+STREAM_ERRORS = (
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+# Content-Type对应的图片扩展名
+IMAGE_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+    'image/bmp': 'bmp',
+    'image/avif': 'avif',
+    'image/heic': 'heic',
+}
+
+
+def sniff_image_type(head):
+    """根据文件头的魔数判断图片格式，返回扩展名，无法识别时返回None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in (b'avif', b'avis'):
+            return 'avif'
+        if brand in (b'heic', b'heix', b'mif1', b'msf1'):
+            return 'heic'
+    return None
+
 
 class MediaDownloader:
     """媒体文件下载器类"""
@@ -18,153 +75,401 @@ class MediaDownloader:
         self.max_retries = crawler_config.get('max_retries', 3)
         # 获取超时时间配置，如果没有设置则默认30秒
         self.timeout = crawler_config.get('timeout', 30)
+        
+        # 并发下载配置：总并发数和单个主机的最大并发连接数
+        download_config = crawler_config.get('media_download', {}) or {}
+        self.workers = max(1, download_config.get('workers', 8))
+        self.per_host = max(1, download_config.get('per_host', 4))
+        # 单张图片的大小上限，超过时放弃下载，0表示不限制
+        self.max_image_bytes = int(download_config.get('max_image_mb', 20) * 1024 * 1024)
+        
+        # 所有下载共用一个会话，连接池按主机复用连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': self.config_manager.user_agent,
+            'Referer': 'https://www.toutiao.com/'
+        })
+        
+        # 全局按主机限速器
+        self.rate_limiter = get_rate_limiter()
+        
+        # 每个主机一个信号量，限制对同一主机的并发请求数
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # 图片按内容寻址存储，相同图片只下载和保存一份，文章目录中为硬链接
+        self.media_store = None
+        if download_config.get('content_store', True):
+            self.media_store = MediaStore(os.path.join(self.config_manager.media_base_dir, '.store'))
+        # 不使用内容寻址存储时，图片请求经过磁盘HTTP缓存（有效期内不发请求，过期后按ETag/Last-Modified验证）
+        self.http_cache = get_http_cache() if self.media_store is None else None
+        
+        # 下载后按感知哈希查找媒体库中的相似图片（同一图片被CDN重新编码为不同尺寸/质量）
+        # keep：只记录；link：文章中的图片改为链接到已有图片；skip：文章中不保存相似图片；off：关闭
+        # 感知哈希可能误判，新下载的图片始终保留在内容寻址存储中，因此link和skip需要开启content_store
+        self.phash_policy = download_config.get('image_phash_policy', 'keep')
+        if self.phash_policy in ('link', 'skip') and self.media_store is None:
+            print(f"未开启content_store，图片感知哈希策略{self.phash_policy}改为keep")
+            self.phash_policy = 'keep'
+        self.image_index = None
+        if self.phash_policy != 'off':
+            if Image is None:
+                print("未安装Pillow，已跳过图片感知哈希去重")
+            else:
+                self.image_index = ImageHashIndex(
+                    os.path.join(self.config_manager.media_base_dir, '.store', 'image_hashes.db'),
+                    max_distance=download_config.get('image_phash_distance', 2)
+                )
+        
+        # 视频使用支持断点续传的分段并行下载，未完成的下载保存在媒体目录下的.partial中
+        self.video_downloader = RangedDownloader(
+            self.session,
+            self.rate_limiter,
+            os.path.join(self.config_manager.media_base_dir, '.partial'),
+            segment_size=int(download_config.get('video_segment_mb', 8) * 1024 * 1024),
+            max_segments=download_config.get('video_segments', 4),
+            max_retries=self.max_retries,
+            timeout=self.timeout
+        )
+        # HLS视频分片并发下载后直接拼接，未完成的分片同样保存在.partial中
+        self.hls_downloader = HlsDownloader(
+            self.session,
+            self.rate_limiter,
+            os.path.join(self.config_manager.media_base_dir, '.partial'),
+            workers=download_config.get('hls_workers', 4),
+            max_retries=self.max_retries,
+            timeout=self.timeout,
+            remux=download_config.get('hls_remux', True)
+        )
+    
+    @property
+    def executor(self):
+        """下载线程池，多篇文章共用，首次使用时创建"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media')
+            return self._executor
+    
+    def _host_slot(self, url):
+        """获取URL所在主机的并发信号量"""
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+            return slot
+    
+    @staticmethod
+    def _normalize_url(url):
+        """补全URL协议，无法识别时返回None"""
+        if url.startswith(('http://', 'https://')):
+            return url
+        # 头条图片通常使用//开头，需要补充协议
+        if url.startswith('//'):
+            return 'https:' + url
+        return None
     
     def download_images(self, image_urls, save_dir):
-        downloaded_images = []
-        
+        """并发下载图片，返回成功保存的图片路径（按图片在文章中的顺序）"""
         # 检查是否需要限制图片数量
         if self.max_images_per_article > 0:
             image_urls = image_urls[:self.max_images_per_article]
-              
-        for i, img_url in enumerate(image_urls):
-            # 实现重试机制
-            retries = 0
-            success = False
-            
-            while retries <= self.max_retries and not success:
-                try:
-                    # 确保URL是完整的
-                    if not img_url.startswith(('http://', 'https://')):
-                        # 头条图片通常使用//开头，需要补充协议
-                        if img_url.startswith('//'):
-                            img_url = 'https:' + img_url
-                        else:
-                            break
-                    
-                    # 获取图片扩展名
-                    img_ext = img_url.split('.')[-1].split('?')[0]  # 获取扩展名，去掉可能的查询参数
-                    if len(img_ext) > 5:  # 如果扩展名太长，可能不是真的扩展名
-                        img_ext = 'jpg'
-                    
-                    # 保存图片
-                    img_name = f"image_{i + 1}.{img_ext}"
-                    img_path = os.path.join(save_dir, img_name)
-                    
-                    # 下载图片
-                    response = requests.get(img_url, timeout=self.timeout)
-                    if response.status_code == 200:
-                        with open(img_path, 'wb') as f:
-                            f.write(response.content)
-                        downloaded_images.append(img_path)
-                        print(f"  已下载图片 {i + 1}/{len(image_urls)}")
-                        success = True
-                    elif retries < self.max_retries:
-                        retries += 1
-                        wait_time = 1 * retries  # 指数退避策略
-                        print(f"  图片下载失败，状态码: {response.status_code}，将在{wait_time}秒后重试({retries}/{self.max_retries})")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"  图片下载失败，状态码: {response.status_code}，已达到最大重试次数")
-                        break
-                except Exception as e:
-                    if retries < self.max_retries:
-                        retries += 1
-                        wait_time = 1 * retries  # 指数退避策略
-                        print(f"  下载图片失败: {str(e)}，将在{wait_time}秒后重试({retries}/{self.max_retries})")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"  下载图片失败: {str(e)}，已达到最大重试次数")
+        
+        futures = [
+            self.executor.submit(self._download_image, img_url, i, len(image_urls), save_dir)
+            for i, img_url in enumerate(image_urls)
+        ]
+        results = [future.result() for future in futures]
+        
+        # 下载后阶段：新下载的图片与媒体库中的图片比较感知哈希
+        replaced = {}
+        if self.image_index is not None:
+            replaced = self._deduplicate_images([result for result in results if result and result[1]])
+        
+        downloaded_images = []
+        for result in results:
+            if not result:
+                continue
+            img_path = replaced.get(result[0], result[0])
+            if img_path:
+                downloaded_images.append(img_path)
+        return downloaded_images
+    
+    def _deduplicate_images(self, new_images):
+        """按感知哈希批量查找相似图片并按策略处理
+        
+        只改变文章目录中的图片，存储中的文件和地址索引保持不变。
+        
+        Args:
+            new_images: 新下载图片的(文章中的路径, 存储中的路径)列表
+        
+        Returns:
+            字典：文章中的路径 -> 处理后的路径（skip策略下为None），未变化的图片不在其中
+        """
+        items = []
+        for img_path, source_path in new_images:
+            try:
+                items.append((img_path, source_path, dhash(img_path), image_size(img_path)))
+            except Exception:
+                # 无法解码的格式不参与去重
+                continue
+        matches = self.image_index.query([value for _, _, value, _ in items])
+        
+        replaced = {}
+        indexed = []
+        for (img_path, source_path, value, size), match in zip(items, matches):
+            # 内容完全相同的图片已由内容寻址存储合并为同一个文件，不是需要处理的相似图片
+            if match is not None and match[0] == source_path:
+                continue
+            if any(other_path == source_path for other_path, _, _ in indexed):
+                continue
+            if match is not None and not self._same_size_ratio(size, match[0]):
+                match = None
+            if match is None:
+                # 同一批次中的相似图片
+                for other_path, other_value, other_size in indexed:
+                    distance = bin(value ^ other_value).count('1')
+                    if distance <= self.image_index.max_distance and same_aspect_ratio(size, other_size):
+                        match = (other_path, distance)
                         break
+            if match is None:
+                indexed.append((source_path, value, size))
+                continue
             
-            # 正常延迟，避免请求过快
-            if success:
-                time.sleep(1)
-        return downloaded_images
+            original_path, distance = match
+            print(f"  图片 {os.path.basename(img_path)} 与已有图片相似（汉明距离 {distance}）")
+            if self.phash_policy == 'keep' or source_path == img_path:
+                indexed.append((source_path, value, size))
+            elif self.phash_policy == 'skip':
+                self._remove_file(img_path)
+                replaced[img_path] = None
+            else:
+                new_path = os.path.splitext(img_path)[0] + os.path.splitext(original_path)[1]
+                self._remove_file(img_path)
+                replaced[img_path] = MediaStore.link(original_path, new_path)
+        self.image_index.add_many([(path, value) for path, value, _ in indexed])
+        return replaced
     
-    def extract_and_download_videos(self, html_content, save_dir):
-        downloaded_videos = []
+    @staticmethod
+    def _same_size_ratio(size, original_path):
+        """与已有图片的宽高比是否一致，已有图片无法读取时视为不一致"""
         try:
-            # 使用BeautifulSoup解析HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
+            return same_aspect_ratio(size, image_size(original_path))
+        except Exception:
+            return False
+    
+    def _download_image(self, img_url, i, total, save_dir):
+        """流式下载单张图片，返回(文章中的路径, 新下载时在存储中的路径)，失败时返回None
+        
+        数据分块写入临时的.part文件，完成后原子重命名，内存占用与图片大小无关；
+        扩展名根据文件头魔数（其次是Content-Type）确定，不是图片或超过大小上限时放弃。
+        """
+        # 确保URL是完整的
+        img_url = self._normalize_url(img_url)
+        if img_url is None:
+            return None
+        
+        # 已下载过的图片直接从存储中链接，不再发出请求（按去掉签名参数的地址判断）
+        if self.media_store is not None:
+            cached = self.media_store.lookup(image_cache_key(img_url))
+            if cached:
+                blob_path, img_ext, size = cached
+                img_path = self.media_store.link(blob_path, os.path.join(save_dir, f"image_{i + 1}.{img_ext}"))
+                self.media_store.record_hit(size)
+                print(f"  已复用图片 {i + 1}/{total}")
+                return img_path, None
+        
+        part_path = os.path.join(save_dir, f"image_{i + 1}.part")
+        try:
+            # 读取响应内容时连接中断或超时，整个请求按重试次数重新下载（请求阶段的重试由限速器负责）
+            attempt = 0
+            while True:
+                try:
+                    result = self._stream_image(img_url, part_path)
+                    break
+                except STREAM_ERRORS as e:
+                    self._remove_file(part_path)
+                    if attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    wait = self.rate_limiter.backoff(attempt)
+                    print(f"  图片传输中断: {e}，{wait:.1f}秒后重试({attempt}/{self.max_retries})")
+                    time.sleep(wait)
             
-            video_elements = soup.find_all('video')
+            if result is None:
+                self._remove_file(part_path)
+                return None
+            img_ext, digest = result
+            img_path = os.path.join(save_dir, f"image_{i + 1}.{img_ext}")
+            if self.media_store is not None:
+                blob_path = self.media_store.add(image_cache_key(img_url), part_path, digest, img_ext)
+                self.media_store.link(blob_path, img_path)
+            else:
+                os.replace(part_path, img_path)
+                blob_path = img_path
+            print(f"  已下载图片 {i + 1}/{total}")
+            return img_path, blob_path
+        except Exception as e:
+            self._remove_file(part_path)
+            print(f"  下载图片失败: {str(e)}")
+            return None
+    
+    def _stream_image(self, img_url, part_path):
+        """请求图片并流式写入part_path，返回(扩展名, SHA-256摘要)，不是图片或超过大小上限时返回None
+        
+        Raises:
+            STREAM_ERRORS: 读取响应内容时连接中断或超时
+        """
+        # 同一主机的并发数受信号量限制，请求速率、重试和熔断由限速器负责
+        with self._host_slot(img_url):
+            if self.http_cache is not None:
+                # 缓存只读取到图片大小上限，超出部分由下面的流式读取判断并放弃
+                response = self.http_cache.request(
+                    self.rate_limiter, self.session, img_url, max_retries=self.max_retries,
+                    max_bytes=self.max_image_bytes, timeout=self.timeout
+                )
+            else:
+                response = self.rate_limiter.request(
+                    self.session, 'GET', img_url, max_retries=self.max_retries,
+                    stream=True, timeout=self.timeout
+                )
+            with response:
+                if response.status_code != 200:
+                    print(f"  图片下载失败，状态码: {response.status_code}")
+                    return None
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and not content_type.startswith(('image/', 'application/octet-stream', 'binary/')):
+                    print(f"  图片下载失败，返回的不是图片: {content_type}")
+                    return None
+                content_length = int(response.headers.get('Content-Length') or 0)
+                if self.max_image_bytes and content_length > self.max_image_bytes:
+                    print(f"  图片过大({content_length} 字节)，已跳过")
+                    return None
                 
-            print(f"找到 {len(video_elements)} 个视频元素")
-            
-            for i, video in enumerate(video_elements):
-                # 获取视频源URL
-                video_url = None
+                img_ext = None
+                size = 0
+                digest = hashlib.sha256()
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        if img_ext is None:
+                            img_ext = sniff_image_type(chunk[:16]) or IMAGE_CONTENT_TYPES.get(content_type)
+                            if img_ext is None:
+                                print("  图片下载失败，无法识别的文件格式")
+                                return None
+                        size += len(chunk)
+                        if self.max_image_bytes and size > self.max_image_bytes:
+                            print(f"  图片超过大小上限({self.max_image_bytes} 字节)，已放弃")
+                            return None
+                        f.write(chunk)
+                        digest.update(chunk)
+        if img_ext is None or size == 0:
+            return None
+        return img_ext, digest.hexdigest()
+    
+    @staticmethod
+    def _remove_file(path):
+        """删除未完成的临时文件"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    def close(self):
+        """关闭下载线程池、会话、媒体存储索引和感知哈希索引"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+        if self.media_store is not None:
+            stats = self.media_store.stats
+            print(f"媒体存储: 复用 {stats['hits']} 次（节省 {stats['bytes_saved'] // 1024} KB 下载），"
+                  f"新保存 {stats['stored']} 个文件，内容重复 {stats['deduplicated']} 个")
+            self.media_store.close()
+            self.media_store = None
+        if self.image_index is not None:
+            self.image_index.close()
+            self.image_index = None
+    
+    def extract_video_urls(self, html_content):
+        """提取文章中的视频地址（去重，按出现顺序）
+        
+        优先使用<video>/<source>标签上的地址；没有时再从页面中的播放器数据里查找
+        videoUrl、m3u8播放列表地址和播放器JSON中base64编码的main_url。
+        """
+        video_urls = []
+        
+        def add(url):
+            if not url:
+                return
+            # 播放器JSON中的地址可能带有转义
+            url = url.replace('\\u002F', '/').replace('\\/', '/').replace('&amp;', '&')
+            if url.startswith('//'):
+                url = 'https:' + url
+            if url.startswith(('http://', 'https://')) and url not in video_urls:
+                video_urls.append(url)
+        
+        # 使用BeautifulSoup解析HTML
+        soup = BeautifulSoup(html_content, 'html.parser')
+        video_elements = soup.find_all('video')
+        print(f"找到 {len(video_elements)} 个视频元素")
+        for video in video_elements:
+            try:
+                video_url = video.get('src')
+                if not video_url:
+                    # 查找source标签
+                    source = video.find('source')
+                    if source and source.get('src'):
+                        video_url = source.get('src')
+                # 如果找不到直接的视频URL，尝试查找data-src或其他可能的属性
+                if not video_url:
+                    video_url = video.get('data-src') or video.get('data-video-url')
+                add(video_url)
+            except Exception as e:
+                print(f"  提取视频URL失败: {str(e)}")
+        
+        if video_elements and not video_urls:
+            # 还可以尝试通过正则表达式查找视频URL
+            video_match = re.search(r'videoUrl[\\s]*:[\\s]*["\'](.*?)["\']', html_content, re.S)
+            if video_match:
+                add(video_match.group(1))
+        
+        if not video_urls:
+            # 播放器数据中的HLS播放列表
+            for match in re.finditer(r'(?:https?:)?(?://|\\u002F\\u002F|\\/\\/)[^"\'\s<>]+?\.m3u8[^"\'\s<>]*', html_content):
+                add(match.group(0))
+            # 播放器JSON中base64编码的地址
+            for match in re.finditer(r'"main_url"\s*:\s*"([A-Za-z0-9+/=]+)"', html_content):
                 try:
-                    if video.get('src'):
-                        video_url = video.get('src')
-                    else:
-                        # 查找source标签
-                        source = video.find('source')
-                        if source and source.get('src'):
-                            video_url = source.get('src')
-                    
-                    # 如果找不到直接的视频URL，尝试查找data-src或其他可能的属性
-                    if not video_url:
-                        video_url = video.get('data-src') or video.get('data-video-url')
-                    
-                    # 还可以尝试通过正则表达式查找视频URL
-                    if not video_url:
-                        video_match = re.search(r'videoUrl[\\s]*:[\\s]*["\'](.*?)["\']', html_content, re.S)
-                        if video_match:
-                            video_url = video_match.group(1)
-                except Exception as e:
-                    print(f"  提取视频URL失败: {str(e)}")
+                    add(base64.b64decode(match.group(1)).decode('utf-8'))
+                except Exception:
                     continue
-                
-                if video_url:
-                    # 确保URL是完整的
-                    if video_url.startswith('//'):
-                        video_url = 'https:' + video_url
-                    elif not video_url.startswith(('http://', 'https://')):
-                        continue
-                    
-                    # 保存视频
-                    video_name = f"video_{i + 1}.mp4"  # 假设视频都是mp4格式
-                    video_path = os.path.join(save_dir, video_name)
-                    
-                    # 实现重试机制
-                    retries = 0
-                    success = False
-                    
-                    while retries <= self.max_retries and not success:
-                        try:
-                            print(f"  正在下载视频 {i + 1}/{len(video_elements)}")
-                            # 下载视频（注意：视频文件可能很大，这里简化处理）
-                            response = requests.get(video_url, stream=True, timeout=self.timeout)
-                            if response.status_code == 200:
-                                with open(video_path, 'wb') as f:
-                                    for chunk in response.iter_content(chunk_size=1024*1024):  # 1MB chunks
-                                        if chunk:
-                                            f.write(chunk)
-                                downloaded_videos.append(video_path)
-                                print(f"  视频下载完成")
-                                success = True
-                            elif retries < self.max_retries:
-                                retries += 1
-                                wait_time = 2 * retries  # 视频下载重试间隔稍长
-                                print(f"  视频下载失败，状态码: {response.status_code}，将在{wait_time}秒后重试({retries}/{self.max_retries})")
-                                time.sleep(wait_time)
-                            else:
-                                print(f"  视频下载失败，状态码: {response.status_code}，已达到最大重试次数")
-                                break
-                        except Exception as e:
-                            if retries < self.max_retries:
-                                retries += 1
-                                wait_time = 2 * retries  # 视频下载重试间隔稍长
-                                print(f"  下载视频失败: {str(e)}，将在{wait_time}秒后重试({retries}/{self.max_retries})")
-                                time.sleep(wait_time)
-                            else:
-                                print(f"  下载视频失败: {str(e)}，已达到最大重试次数")
-                                break
-                    
-                    # 视频下载间隔更长一些，避免请求过快
-                    if success:
-                        time.sleep(2)
+        return video_urls
+    
+    def extract_and_download_videos(self, html_content, save_dir):
+        """下载文章中的视频，HLS播放列表下载分片后拼接，其余地址分段下载"""
+        downloaded_videos = []
+        try:
+            video_urls = self.extract_video_urls(html_content)
+            for i, video_url in enumerate(video_urls):
+                print(f"  正在下载视频 {i + 1}/{len(video_urls)}")
+                if is_playlist_url(video_url):
+                    video_path = self.hls_downloader.download(video_url, os.path.join(save_dir, f"video_{i + 1}"))
+                else:
+                    video_path = os.path.join(save_dir, f"video_{i + 1}.mp4")
+                    if not self.video_downloader.download(video_url, video_path):
+                        video_path = None
+                if video_path:
+                    downloaded_videos.append(video_path)
+                    print(f"  视频下载完成")
         except Exception as e:
             print(f"  提取视频信息失败: {str(e)}")
-        return downloaded_videos
\ No newline at end of file
+        return downloaded_videos
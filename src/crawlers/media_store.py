@@ -0,0 +1,92 @@
+import os
+import time
+import shutil
+import sqlite3
+import threading
+
+
+class MediaStore:
+    """按内容寻址的媒体文件存储
+
+    - 文件按SHA-256摘要保存在 blobs/ab/abcdef....ext，相同内容只保存一份
+    - 索引记录来源地址（调用方给出的规范地址）到摘要的映射，已下载过的地址直接复用，不再发出请求
+    - 文章目录中的文件是指向存储文件的硬链接（不支持硬链接时复制），不额外占用磁盘
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root: 存储目录，需与文章媒体目录位于同一文件系统以便创建硬链接
+        """
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # 本次运行的统计：复用次数、复用节省的下载字节数、新保存的文件数
+        self.stats = {'hits': 0, 'bytes_saved': 0, 'stored': 0, 'deduplicated': 0}
+
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media_urls ("
+            "url TEXT PRIMARY KEY, digest TEXT NOT NULL, ext TEXT NOT NULL, "
+            "size INTEGER NOT NULL, fetched_at REAL NOT NULL)"
+        )
+
+    def blob_path(self, digest, ext):
+        """摘要对应的存储路径"""
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.{ext}")
+
+    def lookup(self, url):
+        """查询地址是否已下载过，返回(存储路径, 扩展名, 大小)，没有时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, ext, size FROM media_urls WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        digest, ext, size = row
+        path = self.blob_path(digest, ext)
+        if not os.path.exists(path):
+            return None
+        return path, ext, size
+
+    def add(self, url, file_path, digest, ext):
+        """把下载完成的文件移入存储（内容已存在时丢弃该文件），记录地址索引，返回存储路径"""
+        path = self.blob_path(digest, ext)
+        size = os.path.getsize(file_path)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(file_path)
+                self.stats['deduplicated'] += 1
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(file_path, path)
+                self.stats['stored'] += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_urls (url, digest, ext, size, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, digest, ext, size, time.time())
+            )
+        return path
+
+    def record_hit(self, size):
+        """记录一次按地址复用"""
+        with self._lock:
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += size
+
+    @staticmethod
+    def link(blob_path, dest_path):
+        """在文章目录中创建指向存储文件的硬链接，不支持时复制"""
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(blob_path, dest_path)
+        except OSError:
+            shutil.copyfile(blob_path, dest_path)
+        return dest_path
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
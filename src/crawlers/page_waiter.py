@@ -0,0 +1,192 @@
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from utils.log_utils import print_to_queue
+
+# 首页/频道页文章卡片选择器
+FEED_CARD_SELECTOR = ".feed-card-article-l"
+# 文章详情页正文选择器
+ARTICLE_CONTENT_SELECTOR = ".syl-device-pc"
+
+# 资源请求计数：用PerformanceObserver累计，不受资源计时缓冲区（Chrome默认250条）已满的影响
+_RESOURCE_COUNTER_SCRIPT = """
+if (!window.__resourceCounter) {
+    window.__resourceCounter = {count: 0};
+    try {
+        new PerformanceObserver(function (list) {
+            window.__resourceCounter.count += list.getEntries().length;
+        }).observe({type: 'resource'});
+    } catch (e) {
+        window.__resourceCounter = null;
+    }
+}
+if (window.__resourceCounter) {
+    return window.__resourceCounter.count;
+}
+// 不支持PerformanceObserver时清空缓冲区，避免缓冲区满后计数不再变化
+if (window.__resourceTimingsCleared === undefined && performance.clearResourceTimings) {
+    performance.clearResourceTimings();
+    window.__resourceTimingsCleared = true;
+}
+return window.performance ? performance.getEntriesByType('resource').length : 0;
+"""
+
+# 第一个匹配元素的标识（链接地址，没有链接时为前80个字符），用于判断内容是否已被替换
+_FIRST_ELEMENT_SIGNATURE_SCRIPT = """
+var element = document.querySelector(arguments[0]);
+if (!element) {
+    return null;
+}
+var link = element.matches('a[href]') ? element : element.querySelector('a[href]');
+return link ? link.href : element.textContent.slice(0, 80);
+"""
+
+# 支持的页面加载策略：normal等待所有资源，eager在DOMContentLoaded后返回，none立即返回
+PAGE_LOAD_STRATEGIES = ('normal', 'eager', 'none')
+
+
+class PageWaiter:
+    """基于WebDriverWait的页面就绪等待器，用条件等待代替固定的time.sleep
+
+    每个等待方法在条件满足时立即返回，并返回实际等待的秒数；
+    超时不会抛出异常，只记录日志，由调用方按原有逻辑继续执行。
+    """
+
+    def __init__(self, driver, timeout=10, poll_interval=0.1, dom_stable_ms=500, network_idle_ms=500, verbose=True):
+        """
+        Args:
+            driver: Selenium浏览器实例
+            timeout: 单次等待的最长时间（秒）
+            poll_interval: 条件轮询间隔（秒）
+            dom_stable_ms: DOM保持不变多少毫秒视为稳定
+            network_idle_ms: 没有新资源请求多少毫秒视为网络空闲
+            verbose: 是否输出每次等待的耗时
+        """
+        self.driver = driver
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.dom_stable_ms = dom_stable_ms
+        self.network_idle_ms = network_idle_ms
+        self.verbose = verbose
+        # 最近一次等待的耗时（秒）
+        self.last_elapsed = 0.0
+
+    def _wait(self, condition, description, timeout=None):
+        """执行条件等待并返回耗时"""
+        start = time.monotonic()
+        satisfied = True
+        try:
+            WebDriverWait(self.driver, timeout or self.timeout, poll_frequency=self.poll_interval).until(condition)
+        except TimeoutException:
+            satisfied = False
+        self.last_elapsed = time.monotonic() - start
+        if self.verbose:
+            if satisfied:
+                print_to_queue(f"  [等待] {description}: {self.last_elapsed:.2f} 秒")
+            else:
+                print_to_queue(f"  [等待] {description}: 超时 {self.last_elapsed:.2f} 秒，继续执行")
+        return self.last_elapsed
+
+    def _stable_condition(self, script, stable_ms):
+        """生成"脚本返回值在stable_ms内保持不变"的等待条件"""
+        state = {'value': None, 'since': None}
+
+        def condition(driver):
+            value = driver.execute_script(script)
+            now = time.monotonic()
+            if value != state['value']:
+                state['value'] = value
+                state['since'] = now
+                return False
+            return (now - state['since']) * 1000 >= stable_ms
+
+        return condition
+
+    def wait_for_document_ready(self, timeout=None):
+        """等待document.readyState为complete"""
+        return self._wait(
+            lambda d: d.execute_script("return document.readyState;") == 'complete',
+            "文档加载完成",
+            timeout
+        )
+
+    def wait_for_selector(self, selector, min_count=1, timeout=None):
+        """等待页面中出现至少min_count个匹配CSS选择器的元素"""
+        return self._wait(
+            lambda d: len(d.find_elements(By.CSS_SELECTOR, selector)) >= min_count,
+            f"元素 {selector} 出现",
+            timeout
+        )
+
+    def wait_for_more(self, selector, previous_count, timeout=None):
+        """滚动加载后，等待匹配元素数量超过previous_count"""
+        return self._wait(
+            lambda d: len(d.find_elements(By.CSS_SELECTOR, selector)) > previous_count,
+            f"加载更多 {selector}",
+            timeout
+        )
+
+    def count(self, selector):
+        """统计当前匹配CSS选择器的元素数量"""
+        try:
+            return len(self.driver.find_elements(By.CSS_SELECTOR, selector))
+        except Exception:
+            return 0
+
+    def snapshot(self, selector):
+        """记录第一个匹配元素及其标识，供wait_for_replaced判断内容是否已切换"""
+        try:
+            element = self.driver.find_element(By.CSS_SELECTOR, selector)
+            return element, self.driver.execute_script(_FIRST_ELEMENT_SIGNATURE_SCRIPT, selector)
+        except Exception:
+            return None
+
+    def wait_for_replaced(self, selector, snapshot, timeout=None):
+        """点击切换后，等待snapshot记录的旧元素从DOM中移除或第一个元素变为其他内容
+
+        切换频道等操作后旧内容仍在页面中，直接等待选择器会立即返回旧内容。
+        """
+        if snapshot is None:
+            return 0.0
+        element, signature = snapshot
+        stale = EC.staleness_of(element)
+
+        def condition(driver):
+            if stale(driver):
+                return True
+            current = driver.execute_script(_FIRST_ELEMENT_SIGNATURE_SCRIPT, selector)
+            return current is not None and current != signature
+
+        return self._wait(condition, f"{selector} 内容切换", timeout)
+
+    def wait_for_dom_stable(self, stable_ms=None, timeout=None):
+        """等待DOM节点数量和页面高度在stable_ms毫秒内不再变化"""
+        stable_ms = stable_ms or self.dom_stable_ms
+        script = "return [document.getElementsByTagName('*').length, document.body ? document.body.scrollHeight : 0];"
+        return self._wait(
+            self._stable_condition(script, stable_ms),
+            f"DOM稳定{stable_ms}ms",
+            timeout
+        )
+
+    def wait_for_network_idle(self, idle_ms=None, timeout=None):
+        """等待资源请求数在idle_ms毫秒内不再增加（基于PerformanceObserver统计的资源请求）"""
+        idle_ms = idle_ms or self.network_idle_ms
+        return self._wait(
+            self._stable_condition(_RESOURCE_COUNTER_SCRIPT, idle_ms),
+            f"网络空闲{idle_ms}ms",
+            timeout
+        )
+
+    def wait_until_ready(self, selector=None, dom_stable=True, timeout=None):
+        """组合等待：先等待关键元素出现，再等待DOM稳定，返回总耗时"""
+        total = 0.0
+        if selector:
+            total += self.wait_for_selector(selector, timeout=timeout)
+        if dom_stable:
+            total += self.wait_for_dom_stable(timeout=timeout)
+        self.last_elapsed = total
+        return total
@@ -0,0 +1,184 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+
+# 归一化时去除的字符：空白和常见中英文标点
+_NOISE_PATTERN = re.compile(r'[\s　-〿＀-￯!-/:-@\[-`{-~]+')
+
+FINGERPRINT_BITS = 64
+_MASK = (1 << FINGERPRINT_BITS) - 1
+
+
+def _features(text):
+    """把文本切分为字符二元组并计数，中文无需分词即可得到稳定的特征"""
+    text = _NOISE_PATTERN.sub('', (text or '').lower())
+    if len(text) < 2:
+        return Counter(text)
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def simhash(text):
+    """计算文本的64位SimHash指纹，相似文本的指纹汉明距离小"""
+    weights = [0] * FINGERPRINT_BITS
+    for feature, count in _features(text).items():
+        h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    """两个指纹之间不同的位数"""
+    return bin((a ^ b) & _MASK).count('1')
+
+
+class SimHashIndex:
+    """SimHash近似重复索引
+
+    指纹按位分成max_distance+1段，两个指纹汉明距离不超过max_distance时至少有一段完全相同
+    （抽屉原理），因此查询只需比较与其某一段相同的候选指纹，而不必遍历全部指纹。
+    指纹持久化在SQLite表中（与文章ID数据库共用文件），启动时加载保留期内的记录。
+    """
+
+    def __init__(self, db_file, kind, max_distance=3, retention_days=14):
+        """
+        Args:
+            db_file: SQLite数据库文件路径
+            kind: 指纹类型（如title、content），不同类型互不比较
+            max_distance: 汉明距离不超过该值视为重复
+            retention_days: 指纹保留天数，0表示永久保留
+        """
+        self.kind = kind
+        self.max_distance = max(0, min(max_distance, FINGERPRINT_BITS - 1))
+        self.retention_seconds = retention_days * 24 * 3600 if retention_days else 0
+        self._lock = threading.Lock()
+
+        # 分段：段数为max_distance+1，每段的位宽尽量均匀
+        bands = self.max_distance + 1
+        width, extra = divmod(FINGERPRINT_BITS, bands)
+        self._bands = []
+        shift = 0
+        for i in range(bands):
+            bits = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << bits) - 1))
+            shift += bits
+        # 每段一个查找表：段值 -> 文章ID列表
+        self._tables = [{} for _ in self._bands]
+        # 文章ID -> (指纹, 位置信息)
+        self._entries = {}
+        # 本次运行加入、尚未持久化的文章ID，处理失败时可以移除
+        self._pending = set()
+
+        self._conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS simhashes ("
+            "kind TEXT NOT NULL, article_id TEXT NOT NULL, fingerprint INTEGER NOT NULL, "
+            "location TEXT, created_at REAL NOT NULL, PRIMARY KEY (kind, article_id))"
+        )
+        self._load()
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    @staticmethod
+    def _to_signed(fingerprint):
+        """SQLite的INTEGER为有符号64位"""
+        return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >= 1 << (FINGERPRINT_BITS - 1) else fingerprint
+
+    def _load(self):
+        """加载保留期内的指纹，删除过期指纹"""
+        cutoff = time.time() - self.retention_seconds if self.retention_seconds else 0
+        with self._lock:
+            self._conn.execute("DELETE FROM simhashes WHERE kind = ? AND created_at < ?", (self.kind, cutoff))
+            rows = self._conn.execute(
+                "SELECT article_id, fingerprint, location FROM simhashes WHERE kind = ?", (self.kind,)
+            ).fetchall()
+            for article_id, fingerprint, location in rows:
+                self._insert(article_id, fingerprint & _MASK, location)
+
+    def _insert(self, article_id, fingerprint, location):
+        self._entries[article_id] = (fingerprint, location)
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            table.setdefault(key, []).append(article_id)
+
+    def _find(self, fingerprint, exclude=None):
+        best = None
+        checked = set()
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            for article_id in table.get(key, ()):
+                if article_id == exclude or article_id in checked:
+                    continue
+                checked.add(article_id)
+                distance = hamming_distance(fingerprint, self._entries[article_id][0])
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (article_id, distance)
+        if best is None:
+            return None
+        article_id, distance = best
+        return article_id, distance, self._entries[article_id][1]
+
+    def find(self, fingerprint, exclude=None):
+        """查找近似重复的指纹，返回(文章ID, 汉明距离, 位置信息)，没有时返回None"""
+        with self._lock:
+            return self._find(fingerprint, exclude)
+
+    def check_and_add(self, article_id, fingerprint, location=None):
+        """查找近似重复，没有时把指纹加入内存索引（原子操作，并发处理的相似文章只有一篇通过）
+
+        Returns:
+            与find相同；返回None表示不重复且已加入索引，需调用persist持久化
+        """
+        article_id = str(article_id)
+        with self._lock:
+            match = self._find(fingerprint, exclude=article_id)
+            if match is None and article_id not in self._entries:
+                self._insert(article_id, fingerprint, location)
+                self._pending.add(article_id)
+            return match
+
+    def discard(self, article_id):
+        """移除尚未持久化的指纹（文章处理失败时调用），已持久化的指纹不受影响"""
+        article_id = str(article_id)
+        with self._lock:
+            if article_id not in self._pending:
+                return
+            self._pending.discard(article_id)
+            fingerprint, _ = self._entries.pop(article_id)
+            for table, key in zip(self._tables, self._band_keys(fingerprint)):
+                ids = table.get(key)
+                if ids and article_id in ids:
+                    ids.remove(article_id)
+                    if not ids:
+                        del table[key]
+
+    def persist(self, article_id, location=None):
+        """把已加入索引的指纹写入数据库，文章保存成功后调用"""
+        article_id = str(article_id)
+        with self._lock:
+            entry = self._entries.get(article_id)
+            if entry is None:
+                return
+            fingerprint, old_location = entry
+            self._pending.discard(article_id)
+            if location is not None:
+                self._entries[article_id] = (fingerprint, location)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO simhashes (kind, article_id, fingerprint, location, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.kind, article_id, self._to_signed(fingerprint), location or old_location, time.time())
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
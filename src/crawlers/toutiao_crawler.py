@@ -1,12 +1,11 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-import time
 import re
 import os
 import sys
 import random
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 
 # 添加项目根目录到sys.path
@@ -19,6 +18,16 @@ from config.config_manager import ConfigManager
 from crawlers.article_extractor import ArticleExtractor
 from crawlers.media_downloader import MediaDownloader
 from crawlers.article_manager import ArticleManager
+from crawlers.driver_pool import DriverPool
+from crawlers.browser_profiles import build_chrome_options, apply_resource_blocking
+from crawlers.feed_session import FeedSession
+from crawlers.feed_interceptor import FeedInterceptor
+from crawlers.crawl_pipeline import CrawlPipeline
+from crawlers.http_fetcher import HttpFetcher
+from crawlers.simhash_index import SimHashIndex, simhash
+from crawlers.image_urls import select_image_urls
+from crawlers.image_postprocessor import ImagePostProcessor, Image
+from crawlers.page_waiter import PageWaiter, FEED_CARD_SELECTOR, ARTICLE_CONTENT_SELECTOR, PAGE_LOAD_STRATEGIES
 from datetime import datetime
 
 # 从工具模块导入print_to_queue
@@ -40,6 +49,7 @@ class ToutiaoCrawler:
         # 获取配置的路径
         self.media_base_dir = self.config.media_base_dir
         self.article_id_file = self.config.article_id_file
+        self.article_id_db = self.config.article_id_db
         
         # 头条首页URL
         self.url = "https://www.toutiao.com/"
@@ -47,7 +57,14 @@ class ToutiaoCrawler:
         # 初始化各模块
         self.article_extractor = ArticleExtractor()
         self.media_downloader = MediaDownloader()
-        self.article_manager = ArticleManager(self.article_id_file)
+        self.article_manager = ArticleManager(
+            self.article_id_file,
+            self.article_id_db,
+            ttl_days=self.config.get('crawler', {}).get('article_id_ttl_days', 14),
+            seen_filter_config=self.config.get('crawler', {}).get('seen_filter', {}),
+            journal_batch_size=self.config.get('crawler', {}).get('id_journal_batch_size', 20),
+            claim_lease_seconds=self.config.get('crawler', {}).get('claim_lease_seconds', 1800)
+        )
         
         # 初始化ChromeDriver服务
         try:
@@ -59,21 +76,151 @@ class ToutiaoCrawler:
         
         # 存储所有频道的文章信息
         self.all_channel_articles = []
+        # 本次运行中已收集的文章ID，跨频道去重
+        self.collected_ids = set()
+        self.collected_lock = threading.Lock()
+        # 收集到新文章时的回调，流水线模式下使用
+        self.article_listener = None
         
-        # 创建Chrome浏览器配置
-        self.options = Options()
-        # self.options.add_argument("--headless")  # 无界面模式
-        self.options.add_argument("--log-level=3")  # 只显示严重错误
-        self.options.add_experimental_option('excludeSwitches', ['enable-logging'])  # 禁止日志输出
-        self.options.add_experimental_option('useAutomationExtension', False)
-        self.options.add_argument(f"user-agent={self.config.user_agent}")
+        crawler_config = self.config.get('crawler', {})
+        
+        # 文章处理并发数，1表示逐篇串行处理
+        self.concurrency = max(1, crawler_config.get('concurrency', 1))
+        # 频道并发爬取的浏览器数，1表示在同一浏览器中依次点击各频道
+        self.channel_workers = max(1, crawler_config.get('channel_workers', 1))
+        
+        # 分阶段流水线配置
+        self.pipeline_config = crawler_config.get('pipeline', {}) or {}
+        
+        # 近似重复检测配置，索引在run中打开
+        self.near_duplicate_config = crawler_config.get('near_duplicate', {}) or {}
+        self.title_index = None
+        self.content_index = None
+        
+        # 图片后处理（缩略图和压缩副本），需要Pillow
+        postprocess_config = crawler_config.get('image_postprocess', {}) or {}
+        self.image_postprocessor = None
+        if postprocess_config.get('enabled', False):
+            if Image is None:
+                print_to_queue("未安装Pillow，已跳过图片后处理")
+            else:
+                self.image_postprocessor = ImagePostProcessor(
+                    workers=postprocess_config.get('workers', 0),
+                    max_pending=postprocess_config.get('max_pending', 32),
+                    thumbnail_size=postprocess_config.get('thumbnail_size', 320),
+                    formats=postprocess_config.get('formats', ['webp']),
+                    quality=postprocess_config.get('quality', 75)
+                )
+        
+        # 页面就绪等待配置
+        self.wait_timeout = crawler_config.get('wait_timeout', 10)
+        self.dom_stable_ms = crawler_config.get('dom_stable_ms', 500)
+        self.network_idle_ms = crawler_config.get('network_idle_ms', 500)
+        
+        # 文章卡片提取方式：js（在页面内增量提取）、network（捕获信息流接口JSON）或 html（解析完整page_source）
+        self.feed_extraction = crawler_config.get('feed_extraction', 'js')
+        self.feed_interceptor = FeedInterceptor()
+        # 信息流接口提供的文章元数据（发布时间、阅读数等），键为文章ID
+        self.article_metadata = {}
+        
+        # 各阶段使用的浏览器配置档：discovery（首页/频道发现）默认lean，detail（文章详情页）默认full
+        profiles = crawler_config.get('browser_profiles', {}) or {}
+        self.discovery_profile = profiles.get('discovery', 'lean')
+        self.detail_profile = profiles.get('detail', 'full')
+        self.blocked_hosts = crawler_config.get('blocked_hosts', []) or []
+        self.driver_max_memory_mb = crawler_config.get('driver_max_memory_mb', 0)
+        
+        # 创建浏览器池：两个阶段配置档相同时共用一个池，否则分别创建
+        driver_pool_size = crawler_config.get('driver_pool_size', 2)
+        driver_max_pages = crawler_config.get('driver_max_pages', 30)
+        if self.discovery_profile == self.detail_profile:
+            # 流水线模式下发现阶段在队列满时会占着浏览器等待，需为获取详情页阶段预留浏览器，否则回退到浏览器时会互相等待
+            discovery_drivers = self.channel_workers
+            if self.pipeline_config.get('enabled', False):
+                discovery_drivers += max(1, self.pipeline_config.get('fetch_workers', 2))
+            self.detail_pool = self.create_driver_pool(
+                self.detail_profile,
+                # 每个工作线程至少需要一个浏览器
+                max(driver_pool_size, self.concurrency, discovery_drivers),
+                driver_max_pages,
+                network_logging=self.feed_extraction == 'network'
+            )
+            self.discovery_pool = self.detail_pool
+        else:
+            self.discovery_pool = self.create_driver_pool(
+                self.discovery_profile,
+                self.channel_workers,
+                driver_max_pages,
+                network_logging=self.feed_extraction == 'network',
+                name="发现阶段浏览器池"
+            )
+            self.detail_pool = self.create_driver_pool(
+                self.detail_profile,
+                max(driver_pool_size, self.concurrency),
+                driver_max_pages,
+                name="详情页浏览器池"
+            )
+        
+        # 文章详情页优先走HTTP请求，正文不在服务端渲染结果中时再回退到浏览器
+        self.http_first = crawler_config.get('http_first', True)
+        self.http_fetcher = HttpFetcher(
+            user_agent=self.config.user_agent,
+            pool_size=max(self.concurrency, 4)
+        )
         
         # 定义频道列表
         self.channels = ["今日要闻", "城市相关", "财经", "科技", "热点"]
         
+        # 定义要点击的导航项索引和名称（今日要闻位于首页，无需点击）
+        self.nav_to_click = [
+            (2, "城市相关"),
+            (4, "财经"),
+            (5, "科技"),
+            (6, "热点")
+        ]
+        
         # 生成各频道的文章分配比例
         self.article_allocation = self.generate_article_allocation()
     
+    def build_options(self, profile='full', network_logging=False):
+        """按配置档创建Chrome浏览器配置"""
+        # 页面加载策略，eager在DOMContentLoaded后即返回，由PageWaiter等待关键元素
+        page_load_strategy = self.config.get('crawler', {}).get('page_load_strategy', 'eager')
+        if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+            page_load_strategy = None
+        options = build_chrome_options(
+            profile,
+            self.config.user_agent,
+            page_load_strategy=page_load_strategy,
+            max_memory_mb=self.driver_max_memory_mb
+        )
+        
+        # network模式需要开启性能日志以捕获信息流接口响应
+        if network_logging:
+            FeedInterceptor.enable_logging(options)
+        return options
+    
+    def create_driver_pool(self, profile, size, max_pages, network_logging=False, name="浏览器池"):
+        """创建使用指定配置档的浏览器池"""
+        return DriverPool(
+            self.chrome_service,
+            lambda: self.build_options(profile, network_logging=network_logging),
+            size=size,
+            max_pages=max_pages,
+            max_memory_mb=self.driver_max_memory_mb,
+            on_create=lambda driver: apply_resource_blocking(driver, profile, self.blocked_hosts),
+            name=name
+        )
+    
+    def create_waiter(self, driver):
+        """为浏览器创建页面就绪等待器"""
+        return PageWaiter(
+            driver,
+            timeout=self.wait_timeout,
+            dom_stable_ms=self.dom_stable_ms,
+            network_idle_ms=self.network_idle_ms
+        )
+    
     def generate_article_allocation(self):
         """生成各频道的文章分配比例
         
@@ -101,7 +248,117 @@ class ToutiaoCrawler:
         print_to_queue(f"优化后的文章分配方案: {allocation}")
         return allocation
     
-    def crawl_homepage(self):
+    def find_uncrawled_articles(self, session, channel_name, limit, is_homepage=False):
+        """从当前页面一次性取出最多limit篇未爬取的文章
+        
+        已爬取的文章和本次运行中其他频道已收集的文章都会被跳过。
+        
+        Returns:
+            [(article_url, article_title, article_id), ...]
+        """
+        if self.feed_extraction in ('js', 'network'):
+            records = []
+            if self.feed_extraction == 'network':
+                # 从捕获的信息流接口响应中构建文章记录
+                records = self.feed_interceptor.collect(session.driver)
+                for record in records:
+                    self.article_metadata[record['id']] = record
+            if not records and not session.buffer:
+                # 只拉取水位线之后新增的卡片，尚未使用的候选保留在缓冲区中
+                records, session.watermark = self.article_extractor.extract_feed_cards_js(
+                    session.driver, session.watermark, is_homepage
+                )
+            session.buffer.extend(records)
+            candidates = []
+            while session.buffer and len(candidates) < limit:
+                record = session.buffer.pop(0)
+                if record['id'] in self.crawled_ids or record['id'] in self.collected_ids:
+                    continue
+                candidates.append((record['url'], record['title'], record['id']))
+            return candidates
+        
+        # 回退方式：解析完整的页面HTML，一次解析取出所需数量
+        html = session.driver.page_source
+        return list(islice(self.article_extractor.extract_uncrawled_articles(
+            html, channel_name, self.crawled_ids, self.collected_ids, is_homepage=is_homepage
+        ), limit))
+    
+    def add_collected_article(self, channel_name, article_url, article_title, article_id):
+        """记录收集到的文章，文章ID在整个运行期间去重（并发频道间线程安全）
+        
+        同时在文章ID数据库中认领该文章，已被其他进程或并行运行的任务认领的文章会被跳过。
+        """
+        with self.collected_lock:
+            if article_id in self.collected_ids:
+                return False
+            if self.is_duplicate_title(article_id, article_title):
+                return False
+            if not self.article_manager.claim_article(article_id):
+                print_to_queue(f"文章 {article_id} 正由其他任务处理，跳过")
+                return False
+            # 认领成功后才加入标题索引，之后的近似标题以这篇文章为准
+            if self.title_index is not None and article_title:
+                self.title_index.check_and_add(article_id, simhash(article_title))
+            self.collected_ids.add(article_id)
+            self.all_channel_articles.append((channel_name, article_url, article_title))
+        
+        # 流水线模式下立即把文章送入下一阶段（队列满时在此阻塞）
+        if self.article_listener:
+            self.article_listener(channel_name, article_url, article_title, article_id)
+        return True
+    
+    def open_near_duplicate_indexes(self):
+        """打开标题和正文的SimHash索引"""
+        config = self.near_duplicate_config
+        if not config.get('enabled', False):
+            return
+        retention_days = self.config.get('crawler', {}).get('article_id_ttl_days', 14)
+        try:
+            self.title_index = SimHashIndex(
+                self.article_id_db, 'title',
+                max_distance=config.get('title_distance', 3),
+                retention_days=retention_days
+            )
+            self.content_index = SimHashIndex(
+                self.article_id_db, 'content',
+                max_distance=config.get('content_distance', 6),
+                retention_days=retention_days
+            )
+            print_to_queue(f"近似重复索引已加载: 标题 {len(self.title_index)} 条，正文 {len(self.content_index)} 条")
+        except Exception as e:
+            print_to_queue(f"打开近似重复索引时出错: {e}")
+            self.close_near_duplicate_indexes()
+    
+    def close_near_duplicate_indexes(self):
+        """关闭SimHash索引"""
+        for index in (self.title_index, self.content_index):
+            if index is not None:
+                index.close()
+        self.title_index = None
+        self.content_index = None
+    
+    def is_duplicate_title(self, article_id, article_title):
+        """标题与已爬取或本次已收集的文章近似重复时返回True，无需获取详情页"""
+        if self.title_index is None or not article_title:
+            return False
+        match = self.title_index.find(simhash(article_title), exclude=str(article_id))
+        if match is None:
+            return False
+        print_to_queue(f"文章 {article_id} 的标题与文章 {match[0]} 近似重复，跳过")
+        return True
+    
+    def discard_fingerprints(self, article_id):
+        """文章处理失败时移除本次加入的指纹，之后收集到的相似文章不会被误判为重复"""
+        for index in (self.title_index, self.content_index):
+            if index is not None:
+                index.discard(article_id)
+    
+    def record_failed_article(self, article_id):
+        """记录页面获取失败（网络等暂时性错误）的文章，下次运行会重新处理"""
+        self.discard_fingerprints(article_id)
+        self.article_manager.record_article(article_id, saved=False)
+    
+    def crawl_homepage(self, session):
         """爬取首页内容，按照分配比例获取文章"""
         print_to_queue("步骤1: 在首页查找今日要闻...")
         try:
@@ -109,163 +366,164 @@ class ToutiaoCrawler:
             need_count = self.article_allocation.get("今日要闻", 1)
             print_to_queue(f"需要从今日要闻获取 {need_count} 篇文章")
             
-            # 保存已处理的文章ID，避免重复
-            processed_ids = set()
             collected_count = 0
             
             # 最大滚动次数，防止无限滚动
             max_scrolls = 10
             scroll_count = 0
             
-            # 连续未找到新文章的次数
-            no_new_articles_count = 0
-            max_no_new_articles = 3
-            
             # 尝试获取指定数量的文章
             while collected_count < need_count and scroll_count < max_scrolls:
-                # 获取当前页面HTML
-                html = self.driver.page_source
-                
-                # 尝试从当前页面提取未爬取的文章
-                article_url, article_title, found_homepage_article = self.article_extractor.extract_uncrawled_article(
-                    html, "今日要闻", self.crawled_ids.union(processed_ids), is_homepage=True
-                )
-                
-                if found_homepage_article and article_url and article_title:
-                    # 提取文章ID
-                    article_id_match = re.search(r'/article/(\d+)/', article_url)
-                    if article_id_match:
-                        article_id = article_id_match.group(1)
-                        processed_ids.add(article_id)
-                        self.all_channel_articles.append(("今日要闻", article_url, article_title))
+                # 一次解析当前页面，取出配额所需的全部候选文章
+                candidates = self.find_uncrawled_articles(session, "今日要闻", need_count - collected_count, is_homepage=True)
+                for article_url, article_title, article_id in candidates:
+                    if self.add_collected_article("今日要闻", article_url, article_title, article_id):
                         collected_count += 1
                         print_to_queue(f"已添加首页文章: {article_title}")
-                        
-                        # 重置连续未找到新文章的计数
-                        no_new_articles_count = 0
-                else:
-                    # 未找到新文章，增加计数
-                    no_new_articles_count += 1
-                    print_to_queue(f"首页未找到新文章，连续未找到次数: {no_new_articles_count}")
-                
-                # 如果连续多次未找到新文章，或者需要继续获取更多文章，则滚动加载
-                if (no_new_articles_count >= max_no_new_articles or collected_count < need_count) and scroll_count < max_scrolls:
-                    print_to_queue(f"首页文章重复或不足，开始滚动加载更多内容...")
-                    # 滚动到页面底部
-                    self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    scroll_count += 1
-                    print_to_queue(f"首页已滚动 {scroll_count}/{max_scrolls} 次")
-                    time.sleep(3)  # 等待页面加载
-                    no_new_articles_count = 0  # 重置计数
-                else:
-                    # 短暂休眠避免请求过快
-                    time.sleep(0.5)
                 
                 # 如果达到需要的数量，停止收集
                 if collected_count >= need_count:
                     break
                 
+                if not candidates:
+                    print_to_queue("首页未找到新文章")
+                
+                # 文章重复或不足，滚动加载
+                print_to_queue(f"首页文章重复或不足，开始滚动加载更多内容...")
+                # 滚动到页面底部
+                card_count = session.waiter.count(FEED_CARD_SELECTOR)
+                session.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                scroll_count += 1
+                print_to_queue(f"首页已滚动 {scroll_count}/{max_scrolls} 次")
+                session.waiter.wait_for_more(FEED_CARD_SELECTOR, card_count)  # 等待新卡片加载
+                
             print_to_queue(f"今日要闻文章收集完成，共 {collected_count} 篇")
             
         except Exception as e:
             print_to_queue(f"查找今日要闻时发生错误: {e}")
     
-    def crawl_channels(self):
-        """爬取各个频道，按照分配比例获取文章"""
-        print_to_queue("正在查找div.feed-default-nav-item元素...")
+    def crawl_channel(self, session, index, channel_name):
+        """点击指定导航项并按照分配比例获取该频道的文章"""
+        # 获取当前频道的分配数量
+        need_count = self.article_allocation.get(channel_name, 2)
+        print_to_queue(f"正在处理 {channel_name} 频道，需要获取 {need_count} 篇文章...")
+        
+        collected_count = 0
         
+        # 点击频道
         try:
             # 查找所有具有feed-default-nav-item类的div元素
-            nav_items = self.driver.find_elements(By.CLASS_NAME, "feed-default-nav-item")
+            nav_items = session.driver.find_elements(By.CLASS_NAME, "feed-default-nav-item")
+            target_item = nav_items[index]
+            # 清空上一个频道的候选文章和已捕获的接口数据
+            session.reset()
+            if self.feed_extraction == 'network':
+                self.feed_interceptor.drain(session.driver)
+            session.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", target_item)
+            # 点击前记录当前的第一张卡片，上一个频道的卡片被替换后才读取
+            previous_cards = session.waiter.snapshot(FEED_CARD_SELECTOR)
+            session.driver.execute_script("arguments[0].click();", target_item)
+            # 等待旧卡片被替换，再等待频道文章卡片出现并稳定
+            session.waiter.wait_for_replaced(FEED_CARD_SELECTOR, previous_cards)
+            session.waiter.wait_until_ready(FEED_CARD_SELECTOR)
+        except Exception as e:
+            print_to_queue(f"点击 {channel_name} 频道失败: {e}")
+            return
+        
+        # 最大滚动次数，防止无限滚动
+        max_scrolls = 10
+        scroll_count = 0
+        
+        # 连续未找到新文章的次数
+        no_new_articles_count = 0
+        max_no_new_articles = 3
+        
+        # 尝试从当前频道获取指定数量的文章
+        while collected_count < need_count and scroll_count < max_scrolls:
+            # 一次解析当前页面，取出配额所需的全部候选文章
+            candidates = self.find_uncrawled_articles(session, channel_name, need_count - collected_count)
+            for article_url, title, article_id in candidates:
+                if self.add_collected_article(channel_name, article_url, title, article_id):
+                    collected_count += 1
+                    print_to_queue(f"已添加{channel_name}频道文章 {collected_count}: {title}")
             
-            # 定义要点击的导航项索引和名称
-            nav_to_click = [
-                (2, "城市相关"),
-                (4, "财经"),
-                (5, "科技"),
-                (6, "热点")
-            ]
+            # 如果达到需要的数量，停止收集
+            if collected_count >= need_count:
+                break
             
-            # 依次点击各个导航项并按照分配比例提取文章
-            for index, channel_name in nav_to_click:
-                # 获取当前频道的分配数量
-                need_count = self.article_allocation.get(channel_name, 2)
-                print_to_queue(f"正在处理 {channel_name} 频道，需要获取 {need_count} 篇文章...")
-                
-                # 保存当前频道已处理的文章ID，避免重复
-                processed_ids = set()
-                collected_count = 0
-                
-                # 点击频道
-                try:
-                    target_item = nav_items[index]
-                    self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", target_item)
-                    time.sleep(1)
-                    self.driver.execute_script("arguments[0].click();", target_item)
-                    time.sleep(3)  # 等待页面加载
-                except Exception as e:
-                    print_to_queue(f"点击 {channel_name} 频道失败: {e}")
-                    continue
-                
-                # 最大滚动次数，防止无限滚动
-                max_scrolls = 10
-                scroll_count = 0
-                
-                # 连续未找到新文章的次数
+            if candidates:
+                # 重置连续未找到新文章的计数
                 no_new_articles_count = 0
-                max_no_new_articles = 3
                 
-                # 尝试从当前频道获取指定数量的文章
-                while collected_count < need_count and scroll_count < max_scrolls:
-                    html = self.driver.page_source
-                    title, article_url = self.article_extractor.extract_uncrawled_article(
-                        html, channel_name, self.crawled_ids.union(processed_ids), is_homepage=False
-                    )
-                    
-                    if title and article_url:
-                        # 提取文章ID
-                        article_id_match = re.search(r'/article/(\d+)/', article_url)
-                        if article_id_match:
-                            article_id = article_id_match.group(1)
-                            processed_ids.add(article_id)
-                            self.all_channel_articles.append((channel_name, article_url, title))
-                            collected_count += 1
-                            print_to_queue(f"已添加{channel_name}频道文章 {collected_count}: {title}")
-                            
-                            # 重置连续未找到新文章的计数
-                            no_new_articles_count = 0
-                            
-                            # 滚动页面加载更多文章
-                            self.driver.execute_script("window.scrollBy(0, 800);")
-                            time.sleep(2)
-                    else:
-                        # 未找到新文章，增加计数
-                        no_new_articles_count += 1
-                        print_to_queue(f"{channel_name}频道未找到新文章，连续未找到次数: {no_new_articles_count}")
-                        
-                        # 如果连续多次未找到新文章，说明当前页面可能都是重复的，需要滚动加载更多
-                        if no_new_articles_count >= max_no_new_articles:
-                            print_to_queue(f"{channel_name}频道文章重复，开始滚动加载更多内容...")
-                            # 滚动到页面底部
-                            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                            scroll_count += 1
-                            print_to_queue(f"{channel_name}频道已滚动 {scroll_count}/{max_scrolls} 次")
-                            time.sleep(3)  # 等待页面加载
-                            no_new_articles_count = 0  # 重置计数
-                        else:
-                            # 小幅度滚动
-                            self.driver.execute_script("window.scrollBy(0, 500);")
-                            time.sleep(2)
-                    
-                    # 如果达到需要的数量，停止收集
-                    if collected_count >= need_count:
-                        break
-                
-                print_to_queue(f"{channel_name}频道文章收集完成，共 {collected_count} 篇")
+                # 滚动页面加载更多文章
+                session.driver.execute_script("window.scrollBy(0, 800);")
+                session.waiter.wait_for_network_idle()
+            else:
+                # 未找到新文章，增加计数
+                no_new_articles_count += 1
+                print_to_queue(f"{channel_name}频道未找到新文章，连续未找到次数: {no_new_articles_count}")
                 
+                # 如果连续多次未找到新文章，说明当前页面可能都是重复的，需要滚动加载更多
+                if no_new_articles_count >= max_no_new_articles:
+                    print_to_queue(f"{channel_name}频道文章重复，开始滚动加载更多内容...")
+                    # 滚动到页面底部
+                    card_count = session.waiter.count(FEED_CARD_SELECTOR)
+                    session.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                    scroll_count += 1
+                    print_to_queue(f"{channel_name}频道已滚动 {scroll_count}/{max_scrolls} 次")
+                    session.waiter.wait_for_more(FEED_CARD_SELECTOR, card_count)  # 等待新卡片加载
+                    no_new_articles_count = 0  # 重置计数
+                else:
+                    # 小幅度滚动
+                    session.driver.execute_script("window.scrollBy(0, 500);")
+                    session.waiter.wait_for_network_idle()
+        
+        print_to_queue(f"{channel_name}频道文章收集完成，共 {collected_count} 篇")
+    
+    def crawl_channels(self, session):
+        """在同一个浏览器中依次爬取各个频道，按照分配比例获取文章"""
+        print_to_queue("正在查找div.feed-default-nav-item元素...")
+        
+        try:
+            # 依次点击各个导航项并按照分配比例提取文章
+            for index, channel_name in self.nav_to_click:
+                self.crawl_channel(session, index, channel_name)
         except Exception as e:
             print_to_queue(f"操作导航项时发生错误: {e}")
     
+    def open_homepage(self, driver):
+        """打开头条首页并等待文章卡片就绪，返回该浏览器的抓取会话"""
+        session = FeedSession(driver, self.create_waiter(driver))
+        print_to_queue(f"正在访问: {self.url}")
+        driver.get(self.url)
+        session.waiter.wait_until_ready(FEED_CARD_SELECTOR)  # 等待首页文章卡片出现并稳定
+        return session
+    
+    def crawl_in_pooled_driver(self, index, channel_name):
+        """并发模式的单个任务：租用独立浏览器打开首页，再爬取首页或指定频道"""
+        try:
+            with self.discovery_pool.lease() as driver:
+                session = self.open_homepage(driver)
+                if index is None:
+                    self.crawl_homepage(session)
+                else:
+                    self.crawl_channel(session, index, channel_name)
+        except Exception as e:
+            print_to_queue(f"爬取 {channel_name} 时发生错误: {e}")
+    
+    def crawl_channels_concurrently(self):
+        """首页和各频道分别使用浏览器池中的独立浏览器并发爬取
+        
+        各频道仍按各自的分配数量收集，结果通过add_collected_article合并去重，
+        发现阶段的耗时取决于最慢的频道而不是所有频道之和。
+        """
+        tasks = [(None, "今日要闻")] + list(self.nav_to_click)
+        print_to_queue(f"并发爬取 {len(tasks)} 个频道，浏览器数: {self.channel_workers}")
+        with ThreadPoolExecutor(max_workers=self.channel_workers) as executor:
+            futures = [executor.submit(self.crawl_in_pooled_driver, index, channel_name) for index, channel_name in tasks]
+            for future in as_completed(futures):
+                future.result()
+    
     def process_articles(self):
         """处理爬取到的文章"""
         # 显示所有频道的文章信息
@@ -296,13 +554,9 @@ class ToutiaoCrawler:
             return
         print_to_queue(f"准备处理 {len(results)} 条新闻")
         
-        processed_count = 0
-        max_articles = len(results)  # 处理所有收集到的文章
-        
-        for i, result in enumerate(results):
-            if processed_count >= max_articles:
-                break
-            
+        # 先筛选出需要处理的文章
+        pending = []
+        for result in results:
             article_relative_url = result[0]
             article_url = 'https://www.toutiao.com' + article_relative_url
             article_title = result[1]
@@ -318,135 +572,326 @@ class ToutiaoCrawler:
                 print_to_queue(f"文章 {article_id} 已爬取过，跳过")
                 continue
             
-            processed_count += 1
-            print_to_queue(f"正在处理第 {processed_count} 条新闻:")
-            print_to_queue(f"标题: {article_title}")
-            print_to_queue(f"URL: {article_url}")
-            print_to_queue(f"文章ID: {article_id}")
-            
-            # 创建文章页面的浏览器配置
-            article_options = Options()
-            article_options.add_argument("--log-level=3")
-            article_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            article_options.add_argument(f"user-agent={self.config.user_agent}")
-            
-            # 打开文章页面
-            if self.chrome_service:
-                article_driver = webdriver.Chrome(service=self.chrome_service, options=article_options)
-            else:
-                article_driver = webdriver.Chrome(options=article_options)
-            article_driver.get(article_url)
-            time.sleep(3)  # 等待页面加载
-            
-            # 获取文章HTML
-            article_html = article_driver.page_source
-            article_driver.quit()
-            
-            # 创建安全的文件名
-            safe_title = re.sub(r'[\\/:*?"<>|]', '_', article_title)
-            
-            # 创建按日期分类的保存目录结构
-            # 1. 首先创建日期文件夹 (YYYYMMDD)
-            current_date = datetime.now().strftime('%Y%m%d')
-            date_dir = os.path.join(self.media_base_dir, current_date)
-            
-            # 2. 在日期文件夹下创建时间戳_标题文件夹 (HHMMSS_标题)
-            time_part = datetime.now().strftime('%H%M%S')
-            article_media_dir = os.path.join(date_dir, f"{time_part}_{safe_title[:16]}")
-            
-            # 创建完整的目录结构
-            os.makedirs(article_media_dir, exist_ok=True)
-            
-            # 保存文章ID到文件
-            self.article_manager.save_article_id(article_id)
-
-            # 提取文章内容
-            content_match = re.search(r'syl-device-pc">(.*?)</article>', article_html, re.S)
-            if content_match:
-                article_content_html = content_match.group(1)
-                
-                # 提取文本内容
-                article_text = self.article_extractor.extract_content_with_bs(article_content_html)
-                
-                # 提取并下载图片
-                print_to_queue(f"  开始提取图片...")
-                soup = BeautifulSoup(article_content_html, 'html.parser')
-                img_tags = soup.find_all('img')
-                img_urls = [img.get('src') for img in img_tags if img.get('src')]
-                
-                # 尝试获取data-src属性（懒加载图片）
-                data_src_urls = [img.get('data-src') for img in img_tags if img.get('data-src')]
-                img_urls.extend(data_src_urls)
-                
-                # 去重
-                img_urls = list(set(img_urls))
-                print_to_queue(f"  找到 {len(img_urls)} 张图片")
-                
-                # 创建图片目录并下载
-                image_dir = os.path.join(article_media_dir, 'images')
-                os.makedirs(image_dir, exist_ok=True)
-                downloaded_images = self.media_downloader.download_images(img_urls, image_dir)
+            pending.append((article_id, article_url, article_title))
+        
+        processed_count = 0
+        if self.concurrency > 1 and len(pending) > 1:
+            # 并发模式：每个工作线程独立完成页面获取、内容提取和媒体下载
+            print_to_queue(f"并发处理文章，工作线程数: {self.concurrency}")
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = [
+                    executor.submit(self.process_article, i + 1, article_id, article_url, article_title)
+                    for i, (article_id, article_url, article_title) in enumerate(pending)
+                ]
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        processed_count += 1
+                    except Exception as e:
+                        print_to_queue(f"处理文章时发生错误: {e}")
+        else:
+            for i, (article_id, article_url, article_title) in enumerate(pending):
+                try:
+                    self.process_article(i + 1, article_id, article_url, article_title)
+                    processed_count += 1
+                except Exception as e:
+                    print_to_queue(f"处理文章时发生错误: {e}")
+        
+        print_to_queue(f"处理完成，共处理了 {processed_count} 篇新文章")
+        print_to_queue(f"媒体文件已保存到: {self.media_base_dir}")
+        print_to_queue(f"文章ID记录保存在: {self.article_id_db}")
+    
+    def fetch_article_html(self, article_url):
+        """获取文章详情页HTML，优先HTTP请求，失败时从浏览器池租用浏览器加载
+        
+        Returns:
+            页面HTML，浏览器也无法打开时返回None
+        """
+        if self.http_first:
+            html = self.http_fetcher.get_html(article_url)
+            if html and self.article_extractor.extract_article_content(html):
+                print_to_queue("  已通过HTTP获取文章页面")
+                return html
+            print_to_queue("  HTTP页面中未找到正文，改用浏览器加载")
+        
+        # 从浏览器池租用浏览器打开文章页面
+        try:
+            with self.detail_pool.lease() as article_driver:
+                article_driver.get(article_url)
+                self.create_waiter(article_driver).wait_for_selector(ARTICLE_CONTENT_SELECTOR)  # 等待正文出现
+                return article_driver.page_source
+        except Exception as e:
+            print_to_queue(f"打开文章页面失败: {e}")
+            return None
+    
+    def process_article(self, index, article_id, article_url, article_title):
+        """处理单篇文章：获取页面、提取内容并下载媒体文件
+        
+        Returns:
+            成功提取到正文时返回True，否则返回False
+        """
+        try:
+            job = self.fetch_article({
+                'index': index,
+                'article_id': article_id,
+                'article_url': article_url,
+                'article_title': article_title
+            })
+            if job is None:
+                return False
+            job = self.extract_article(job)
+            if job is None:
+                return False
+            self.download_article_media(job)
+            self.save_article_content(job)
+            return True
+        except Exception:
+            self.discard_fingerprints(article_id)
+            raise
+    
+    def fetch_article(self, job):
+        """阶段：获取文章详情页HTML，失败时返回None"""
+        print_to_queue(f"正在处理第 {job['index']} 条新闻:")
+        print_to_queue(f"标题: {job['article_title']}")
+        print_to_queue(f"URL: {job['article_url']}")
+        print_to_queue(f"文章ID: {job['article_id']}")
+        
+        # 获取文章HTML
+        job['article_html'] = self.fetch_article_html(job['article_url'])
+        if job['article_html'] is None:
+            self.record_failed_article(job['article_id'])
+            return None
+        return job
+    
+    def extract_article(self, job):
+        """阶段：创建保存目录，提取正文文本和图片地址，未提取到正文时返回None"""
+        # 提取完成后不再需要整页HTML，及时释放
+        article_html = job.pop('article_html')
+        
+        # 创建安全的文件名
+        safe_title = re.sub(r'[\\/:*?"<>|]', '_', job['article_title'])
+        
+        # 创建按日期分类的保存目录结构
+        # 1. 首先创建日期文件夹 (YYYYMMDD)
+        current_date = datetime.now().strftime('%Y%m%d')
+        date_dir = os.path.join(self.media_base_dir, current_date)
+        
+        # 2. 在日期文件夹下创建时间戳_标题文件夹 (HHMMSS_标题)
+        time_part = datetime.now().strftime('%H%M%S')
+        article_media_dir = os.path.join(date_dir, f"{time_part}_{safe_title[:16]}")
+        
+        # 创建完整的目录结构
+        os.makedirs(article_media_dir, exist_ok=True)
+        job['article_media_dir'] = article_media_dir
+        
+        # 提取文章内容
+        article_content_html = self.article_extractor.extract_article_content(article_html)
+        if not article_content_html:
+            # 页面已获取但没有正文（视频、图集等页面），重新获取结果相同，标记为已处理，之后不再占用配额
+            print_to_queue("未能提取到文章内容，标记为已处理")
+            self.discard_fingerprints(job['article_id'])
+            try:
+                os.rmdir(article_media_dir)
+            except OSError:
+                pass
+            self.article_manager.record_article(job['article_id'], saved=True)
+            return None
+        job['article_content_html'] = article_content_html
+        
+        # 提取文本内容
+        job['article_text'] = self.article_extractor.extract_content_with_bs(article_content_html)
+        
+        # 正文与已保存的文章近似重复时不再下载媒体
+        if self.content_index is not None and job['article_text']:
+            match = self.content_index.check_and_add(job['article_id'], simhash(job['article_text']), article_media_dir)
+            if match is not None:
+                duplicate_id, distance, location = match
+                print_to_queue(f"  正文与文章 {duplicate_id} 近似重复（汉明距离 {distance}）")
+                if self.near_duplicate_config.get('action', 'link') == 'skip':
+                    try:
+                        os.rmdir(article_media_dir)
+                    except OSError:
+                        pass
+                    # 标记为已爬取，之后不再重复获取
+                    self.article_manager.record_article(job['article_id'], saved=True)
+                    return None
+                # link：只保存正文并记录与原文章的关联
+                job['duplicate_of'] = match
+                job['img_urls'] = []
+                return job
+        
+        # 提取图片地址
+        print_to_queue(f"  开始提取图片...")
+        soup = BeautifulSoup(article_content_html, 'html.parser')
+        img_tags = soup.find_all('img')
+        
+        # 合并src/data-src（懒加载图片）等地址，去掉占位图，同一图片的多个尺寸只保留一个
+        image_max_width = self.config.get('crawler', {}).get('media_download', {}).get('image_max_width', 0)
+        job['img_urls'] = select_image_urls(img_tags, max_width=image_max_width)
+        print_to_queue(f"  找到 {len(job['img_urls'])} 张图片")
+        return job
+    
+    def download_article_media(self, job):
+        """阶段：下载文章中的图片和视频"""
+        article_media_dir = job['article_media_dir']
+        if job.get('duplicate_of'):
+            # 近似重复文章的媒体已随原文章保存
+            job['downloaded_images'] = []
+            job['downloaded_videos'] = []
+            return job
+        
+        # 创建图片目录并下载
+        image_dir = os.path.join(article_media_dir, 'images')
+        os.makedirs(image_dir, exist_ok=True)
+        job['downloaded_images'] = self.media_downloader.download_images(job['img_urls'], image_dir)
+        
+        # 缩略图和压缩副本在进程池中生成，不阻塞后续处理
+        if self.image_postprocessor is not None:
+            self.image_postprocessor.submit(job['downloaded_images'], image_dir)
+        
+        # 提取并下载视频
+        print_to_queue(f"  开始提取视频...")
+        video_dir = os.path.join(article_media_dir, 'videos')
+        os.makedirs(video_dir, exist_ok=True)
+        job['downloaded_videos'] = self.media_downloader.extract_and_download_videos(job['article_content_html'], video_dir)
+        return job
+    
+    def fsync_files(self, paths):
+        """确保已下载的文件写入磁盘"""
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+    
+    def save_article_content(self, job):
+        """阶段：保存文章内容到文件"""
+        article_text = job['article_text']
+        article_content_file = os.path.join(job['article_media_dir'], 'content.txt')
+        metadata = self.article_metadata.get(job['article_id'])
+        with open(article_content_file, 'w', encoding='utf-8') as article_f:
+            article_f.write(f"标题: {job['article_title']}\n")
+            if job.get('duplicate_of'):
+                duplicate_id, distance, location = job['duplicate_of']
+                article_f.write(f"近似重复: 文章 {duplicate_id}（汉明距离 {distance}），媒体见 {location}\n")
+            if metadata:
+                # 信息流接口提供的元数据
+                if metadata.get('publish_time'):
+                    publish_time = datetime.fromtimestamp(int(metadata['publish_time'])).strftime('%Y-%m-%d %H:%M:%S')
+                    article_f.write(f"发布时间: {publish_time}\n")
+                article_f.write(f"阅读: {metadata.get('read_count', 0)} 评论: {metadata.get('comment_count', 0)} 点赞: {metadata.get('digg_count', 0)}\n")
+            article_f.write("正文内容:\n")
+            article_f.write(article_text)
+            article_f.flush()
+            os.fsync(article_f.fileno())
+        
+        # 内容和媒体文件都落盘后才把文章标记为已爬取
+        self.fsync_files(job['downloaded_images'] + job['downloaded_videos'])
+        self.article_manager.record_article(job['article_id'], saved=True)
+        
+        # 保存成功后持久化指纹，供之后的运行判断近似重复
+        if self.title_index is not None:
+            self.title_index.persist(job['article_id'], job['article_media_dir'])
+        if self.content_index is not None and not job.get('duplicate_of'):
+            self.content_index.persist(job['article_id'], job['article_media_dir'])
+        
+        # 显示处理结果
+        print_to_queue(f"文章内容已提取，长度: {len(article_text)} 字符")
+        print_to_queue(f"图片下载完成，共 {len(job['downloaded_images'])} 张")
+        print_to_queue(f"视频下载完成，共 {len(job['downloaded_videos'])} 个")
+        return job
+    
+    def discover_articles(self):
+        """发现阶段：爬取首页和各频道，收集待处理的文章"""
+        if self.channel_workers > 1:
+            # 首页和各频道并发爬取
+            self.crawl_channels_concurrently()
+        else:
+            driver = None
+            try:
+                # 从浏览器池租用浏览器实例
+                driver = self.discovery_pool.acquire()
+                session = self.open_homepage(driver)
                 
-                # 提取并下载视频
-                print_to_queue(f"  开始提取视频...")
-                video_dir = os.path.join(article_media_dir, 'videos')
-                os.makedirs(video_dir, exist_ok=True)
-                downloaded_videos = self.media_downloader.extract_and_download_videos(article_content_html, video_dir)
+                # 爬取首页
+                self.crawl_homepage(session)
                 
-                # 保存文章内容到文件
-                article_content_file = os.path.join(article_media_dir, 'content.txt')
-                with open(article_content_file, 'w', encoding='utf-8') as article_f:
-                    article_f.write(f"标题: {article_title}\n")
-                    article_f.write("正文内容:\n")
-                    article_f.write(article_text)
+                # 爬取各频道
+                self.crawl_channels(session)
                 
-                # 显示处理结果
-                print_to_queue(f"文章内容已提取，长度: {len(article_text)} 字符")
-                print_to_queue(f"图片下载完成，共 {len(downloaded_images)} 张")
-                print_to_queue(f"视频下载完成，共 {len(downloaded_videos)} 个")
-            else:
-                print_to_queue("未能提取到文章内容")
+            except Exception as e:
+                print_to_queue(f"发生错误: {e}")
+            finally:
+                # 归还浏览器，两个阶段共用浏览器池时供文章详情页继续复用
+                if driver is not None:
+                    self.discovery_pool.release(driver)
         
+        # 发现阶段使用独立的浏览器池时，提前关闭以释放内存
+        if self.discovery_pool is not self.detail_pool:
+            self.discovery_pool.close_all()
+    
+    def run_pipeline(self):
+        """流水线模式：文章一经发现即进入详情页获取、提取、媒体下载和保存各阶段"""
+        pipeline_config = self.pipeline_config
+        pipeline = CrawlPipeline(
+            self,
+            queue_size=pipeline_config.get('queue_size', 5),
+            fetch_workers=pipeline_config.get('fetch_workers', 2),
+            extract_workers=pipeline_config.get('extract_workers', 1),
+            media_workers=pipeline_config.get('media_workers', 3),
+            persist_workers=pipeline_config.get('persist_workers', 1)
+        )
+        
+        def discover(emit):
+            def on_article_collected(channel_name, article_url, article_title, article_id):
+                emit(article_id, article_url, f"[{channel_name}] {article_title}")
+            self.article_listener = on_article_collected
+            try:
+                self.discover_articles()
+            finally:
+                self.article_listener = None
+        
+        print_to_queue("以流水线模式运行爬虫")
+        processed_count = pipeline.run(discover)
         print_to_queue(f"处理完成，共处理了 {processed_count} 篇新文章")
         print_to_queue(f"媒体文件已保存到: {self.media_base_dir}")
-        print_to_queue(f"文章ID记录保存在: {self.article_id_file}")
+        print_to_queue(f"文章ID记录保存在: {self.article_id_db}")
     
     def run(self):
         """运行爬虫主流程"""
         # 读取已爬取的文章ID
         self.crawled_ids = self.article_manager.read_article_ids()
         print_to_queue(f"已爬取的文章ID数量: {len(self.crawled_ids)}")
+        self.open_near_duplicate_indexes()
         
         try:
-            # 创建浏览器实例
-            if self.chrome_service:
-                self.driver = webdriver.Chrome(service=self.chrome_service, options=self.options)
+            # 调试模式下只收集文章，不执行详细爬取，因此不使用流水线
+            if self.pipeline_config.get('enabled', False) and not self.config.get('debug', False):
+                self.run_pipeline()
             else:
-                # 回退到默认方式
-                self.driver = webdriver.Chrome(options=self.options)
-            
-            # 访问头条网站
-            print_to_queue(f"正在访问: {self.url}")
-            self.driver.get(self.url)
-            time.sleep(5)  # 等待页面完全加载
-            
-            # 爬取首页
-            self.crawl_homepage()
-            
-            # 爬取各频道
-            self.crawl_channels()
-            
-        except Exception as e:
-            print_to_queue(f"发生错误: {e}")
+                self.discover_articles()
+                
+                # 处理文章
+                if self.all_channel_articles:
+                    self.process_articles()
         finally:
-            # 关闭浏览器
-            if hasattr(self, 'driver'):
-                print_to_queue("关闭浏览器...")
-                self.driver.quit()
-        
-        # 处理文章
-        if self.all_channel_articles:
-            self.process_articles()
+            # 提交尚在缓冲区中的文章ID记录并关闭数据库
+            self.article_manager.close()
+            self.close_near_duplicate_indexes()
+            self.media_downloader.close()
+            if self.image_postprocessor is not None:
+                self.image_postprocessor.close()
+            if self.http_fetcher.http_cache is not None:
+                print_to_queue(self.http_fetcher.http_cache.summary())
+            
+            # 关闭浏览器池中的所有浏览器
+            print_to_queue("关闭浏览器...")
+            self.discovery_pool.close_all()
+            self.detail_pool.close_all()
 
 # 如果直接运行此文件，执行爬虫
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+# 流式写入的分块大小
+CHUNK_SIZE = 256 * 1024
+# 进度文件最短保存间隔（秒）
+PROGRESS_INTERVAL = 1.0
+# 锁文件超过该时长未更新视为持有者已退出（下载过程中随进度定期更新）
+LOCK_STALE_SECONDS = 600
+
+_CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class RangedDownloader:
+    """支持断点续传的分段并行下载器
+
+    - 服务端支持Range请求时，大文件按segment_size切分为多个分段并行下载，写入同一个预分配的.part文件
+    - 各分段的完成进度保存在.progress文件中，下载中断后再次下载同一地址时从断点继续
+    - 全部分段完成后校验文件大小与Content-Range/Content-Length一致，再原子重命名到目标路径
+    - 服务端不支持Range时退化为整体流式下载
+    未完成的文件保存在partial_dir中（按地址命名，不随文章目录变化），因此下次运行也能续传。
+    同一地址同时只有一个下载使用这些文件（进程内互斥锁加.lock文件），其他下载改用私有的临时文件，不续传。
+    """
+
+    # 进程内各地址正在使用的未完成文件
+    _active_keys = set()
+    _active_lock = threading.Lock()
+
+    def __init__(self, session, rate_limiter, partial_dir, segment_size=8 * 1024 * 1024, max_segments=4,
+                 max_retries=3, timeout=30, stale_days=7):
+        """
+        Args:
+            session: 共用的requests.Session
+            rate_limiter: 按主机限速器
+            partial_dir: 未完成下载的保存目录
+            segment_size: 每个分段的最小字节数，小于该值的文件不分段
+            max_segments: 单个文件最多同时下载的分段数
+            max_retries: 每个分段的重试次数（每次从已下载的位置继续）
+            timeout: 请求超时时间（秒）
+            stale_days: 超过该天数未更新的未完成下载会被清理
+        """
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.partial_dir = partial_dir
+        self.segment_size = max(1024 * 1024, segment_size)
+        self.max_segments = max(1, max_segments)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        os.makedirs(partial_dir, exist_ok=True)
+        self._remove_stale(stale_days)
+
+    def _remove_stale(self, stale_days):
+        """清理长时间未更新的未完成下载"""
+        cutoff = time.time() - stale_days * 24 * 3600
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _partial_key(self, url):
+        """按地址（不含查询参数，签名参数会变化）确定未完成文件的名称"""
+        parts = urlsplit(url)
+        return hashlib.sha1(f"{parts.netloc}{parts.path}".encode('utf-8')).hexdigest()
+
+    def _acquire(self, key):
+        """独占地址对应的未完成文件，已被本进程或其他进程使用时返回False"""
+        with self._active_lock:
+            if key in self._active_keys:
+                return False
+            self._active_keys.add(key)
+        lock_path = os.path.join(self.partial_dir, key + '.lock')
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+                os.write(fd, str(os.getpid()).encode('ascii'))
+                os.close(fd)
+                return True
+            except FileExistsError:
+                # 持有者异常退出时留下的锁文件，过期后接管
+                try:
+                    if time.time() - os.path.getmtime(lock_path) < LOCK_STALE_SECONDS:
+                        break
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+            except OSError:
+                break
+        with self._active_lock:
+            self._active_keys.discard(key)
+        return False
+
+    def _release(self, key):
+        self._remove(os.path.join(self.partial_dir, key + '.lock'))
+        with self._active_lock:
+            self._active_keys.discard(key)
+
+    @staticmethod
+    def _touch_lock(progress_path):
+        """更新进度时刷新锁文件的修改时间，表明下载仍在进行"""
+        lock_path = progress_path[:-len('.progress')] + '.lock'
+        try:
+            os.utime(lock_path)
+        except OSError:
+            pass
+
+    def _request(self, url, headers=None):
+        return self.rate_limiter.request(
+            self.session, 'GET', url, max_retries=self.max_retries,
+            headers=headers, stream=True, timeout=self.timeout
+        )
+
+    @staticmethod
+    def _remove(*paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def download(self, url, save_path):
+        """下载文件到save_path，成功返回True"""
+        key = self._partial_key(url)
+        if self._acquire(key):
+            base = os.path.join(self.partial_dir, key)
+            try:
+                return self._download(url, base + '.part', base + '.progress', save_path)
+            finally:
+                self._release(key)
+        # 同一地址正在由其他任务下载：使用私有的临时文件，结束后删除，不影响对方的断点
+        print("  同一视频正在由其他任务下载，本次不使用断点续传")
+        base = os.path.join(self.partial_dir, f"{key}.{os.getpid()}-{threading.get_ident()}")
+        try:
+            return self._download(url, base + '.part', base + '.progress', save_path)
+        finally:
+            self._remove(base + '.part', base + '.progress')
+
+    def _download(self, url, part_path, progress_path, save_path):
+        try:
+            # 请求第一个字节，探测文件大小和是否支持Range
+            response = self._request(url, headers={'Range': 'bytes=0-0'})
+            with response:
+                if response.status_code == 206:
+                    match = _CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+                    if match and match.group(3) != '*':
+                        total = int(match.group(3))
+                        etag = response.headers.get('ETag')
+                    else:
+                        total = None
+                elif response.status_code == 200:
+                    # 不支持Range，直接使用这个响应整体下载
+                    return self._download_whole(response, part_path, progress_path, save_path)
+                else:
+                    print(f"  视频下载失败，状态码: {response.status_code}")
+                    return False
+            if total is None:
+                # 无法得知文件大小，不带Range重新整体下载
+                with self._request(url) as response:
+                    if response.status_code != 200:
+                        print(f"  视频下载失败，状态码: {response.status_code}")
+                        return False
+                    return self._download_whole(response, part_path, progress_path, save_path)
+            return self._download_ranged(url, total, etag, part_path, progress_path, save_path)
+        except Exception as e:
+            print(f"  下载视频失败: {str(e)}")
+            return False
+
+    def _download_whole(self, response, part_path, progress_path, save_path):
+        """整体流式下载，完成后校验Content-Length"""
+        expected = int(response.headers.get('Content-Length') or 0)
+        size = 0
+        last_touched = time.monotonic()
+        with open(part_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    size += len(chunk)
+                    if time.monotonic() - last_touched >= PROGRESS_INTERVAL:
+                        self._touch_lock(progress_path)
+                        last_touched = time.monotonic()
+        self._remove(progress_path)
+        if expected and size != expected:
+            print(f"  视频大小校验失败: {size}/{expected} 字节")
+            self._remove(part_path)
+            return False
+        os.replace(part_path, save_path)
+        return True
+
+    def _load_progress(self, progress_path, part_path, total, etag):
+        """读取与当前文件一致的下载进度，不一致或不存在时返回None"""
+        try:
+            with open(progress_path, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if progress.get('size') != total or progress.get('etag') != etag:
+            return None
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != total:
+            return None
+        return progress
+
+    @classmethod
+    def _save_progress(cls, progress_path, progress):
+        """原子写入进度文件"""
+        tmp_path = progress_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, progress_path)
+        cls._touch_lock(progress_path)
+
+    def _plan_segments(self, total):
+        """把文件切分为分段，每段为[起始位置, 结束位置(含), 已下载字节数]"""
+        count = max(1, min(self.max_segments, total // self.segment_size))
+        step = max(1, -(-total // count))
+        return [[start, min(start + step, total) - 1, 0] for start in range(0, total, step)]
+
+    def _download_ranged(self, url, total, etag, part_path, progress_path, save_path):
+        """分段并行下载，进度持久化，支持断点续传"""
+        progress = self._load_progress(progress_path, part_path, total, etag)
+        if progress is None:
+            progress = {'size': total, 'etag': etag, 'segments': self._plan_segments(total)}
+            with open(part_path, 'wb') as f:
+                f.truncate(total)
+            self._save_progress(progress_path, progress)
+        else:
+            done = sum(segment[2] for segment in progress['segments'])
+            print(f"  从断点继续下载视频: 已完成 {done}/{total} 字节")
+
+        lock = threading.Lock()
+        last_saved = [time.monotonic()]
+
+        def record(segment, length):
+            """更新分段进度，定期保存进度文件（调用前数据已写出到文件）"""
+            with lock:
+                segment[2] += length
+                if time.monotonic() - last_saved[0] >= PROGRESS_INTERVAL:
+                    self._save_progress(progress_path, progress)
+                    last_saved[0] = time.monotonic()
+
+        def download_segment(segment):
+            retries = 0
+            with open(part_path, 'r+b') as f:
+                while segment[0] + segment[2] <= segment[1]:
+                    start = segment[0] + segment[2]
+                    try:
+                        with self._request(url, headers={'Range': f"bytes={start}-{segment[1]}"}) as response:
+                            if response.status_code != 206:
+                                raise IOError(f"分段请求返回状态码 {response.status_code}")
+                            f.seek(start)
+                            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                                remaining = segment[1] - (segment[0] + segment[2]) + 1
+                                chunk = chunk[:remaining]
+                                if not chunk:
+                                    continue
+                                f.write(chunk)
+                                f.flush()
+                                record(segment, len(chunk))
+                                if len(chunk) >= remaining:
+                                    break
+                        if segment[0] + segment[2] <= segment[1]:
+                            raise IOError("分段数据不完整")
+                    except Exception as e:
+                        if retries >= self.max_retries:
+                            print(f"  视频分段 {segment[0]}-{segment[1]} 下载失败: {str(e)}，已达到最大重试次数")
+                            return False
+                        retries += 1
+                        print(f"  视频分段 {segment[0]}-{segment[1]} 下载中断: {str(e)}，从断点重试({retries}/{self.max_retries})")
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+
+        pending = [segment for segment in progress['segments'] if segment[0] + segment[2] <= segment[1]]
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                results = list(executor.map(download_segment, pending))
+        else:
+            results = []
+        self._save_progress(progress_path, progress)
+        if not all(results):
+            print("  视频未下载完整，下次运行时从断点继续")
+            return False
+
+        # 校验大小
+        downloaded = sum(segment[2] for segment in progress['segments'])
+        if downloaded != total or os.path.getsize(part_path) != total:
+            print(f"  视频大小校验失败: {downloaded}/{total} 字节")
+            self._remove(part_path, progress_path)
+            return False
+        os.replace(part_path, save_path)
+        self._remove(progress_path)
+        return True
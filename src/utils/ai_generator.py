@@ -11,6 +11,7 @@ import logging
 import requests
 from typing import Dict, Optional, List, Any
 from config.config_manager import ConfigManager
+from utils.rate_limiter import get_rate_limiter
 
 # 配置日志
 logging.basicConfig(
@@ -43,6 +44,10 @@ class AIGenerator:
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {api_key}'
         }
+        
+        # 复用连接，请求经过全局限速器（限速、429/503退避重试、熔断）
+        self.session = requests.Session()
+        self.rate_limiter = get_rate_limiter()
     
     def read_text_file(self, file_path: str) -> Optional[str]:
         """
@@ -104,7 +109,9 @@ class AIGenerator:
             
             # 发送请求
             logger.info(f"正在调用AI API，模型: {model}")
-            response = requests.post(
+            response = self.rate_limiter.request(
+                self.session,
+                'POST',
                 self.api_url,
                 headers=self.headers,
                 json=data,
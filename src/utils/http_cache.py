@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+
+from requests.structures import CaseInsensitiveDict
+
+from config.config_manager import ConfigManager
+from utils.log_utils import print_to_queue
+
+# 读取和写入缓存内容的分块大小
+CHUNK_SIZE = 64 * 1024
+
+# 随缓存内容保存的响应头
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date')
+
+# 只有Last-Modified时按(Date - Last-Modified)的10%估算有效期，最长一天
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX = 24 * 3600
+
+
+def parse_cache_control(value):
+    """解析Cache-Control响应头，返回{指令: 值}，没有值的指令为True"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if arg else True
+    return directives
+
+
+def _http_date(value):
+    """解析HTTP日期为时间戳，无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, default_ttl=0):
+    """根据响应头计算缓存有效期（秒），不允许缓存时返回None
+
+    优先级：Cache-Control的no-store/no-cache/max-age，其次是Expires，
+    再次是按Last-Modified估算，都没有时使用default_ttl。
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives or headers.get('Vary', '').strip() == '*':
+        return None
+    if 'no-cache' in directives:
+        return 0
+    age = 0
+    try:
+        age = max(0, int(headers.get('Age') or 0))
+    except ValueError:
+        pass
+    if 'max-age' in directives:
+        try:
+            return max(0, int(directives['max-age']) - age)
+        except ValueError:
+            return 0
+    date = _http_date(headers.get('Date')) or time.time()
+    if headers.get('Expires'):
+        expires = _http_date(headers.get('Expires'))
+        # 无法解析的Expires（如"0"）表示已过期
+        return max(0, expires - date) if expires is not None else 0
+    last_modified = _http_date(headers.get('Last-Modified'))
+    if last_modified is not None and last_modified < date:
+        return min(HEURISTIC_MAX, (date - last_modified) * HEURISTIC_FRACTION)
+    return default_ttl
+
+
+class CachedResponse:
+    """从缓存文件读取的响应，提供与requests.Response相同的常用属性"""
+
+    def __init__(self, url, headers, body_path, temporary=False, remainder=None, response=None):
+        """
+        Args:
+            url: 请求地址
+            headers: 响应头
+            body_path: 响应内容所在的文件
+            temporary: 为True时（内容未写入缓存）关闭响应后删除文件
+            remainder: 文件之后尚未读取的内容分块（超过缓存上限时由调用方继续流式读取）
+            response: remainder所属的原始响应，关闭时一并关闭
+        """
+        self.url = url
+        self.status_code = 200
+        self.headers = CaseInsensitiveDict(headers)
+        if remainder is None:
+            self.headers['Content-Length'] = str(os.path.getsize(body_path))
+        self.body_path = body_path
+        self.temporary = temporary
+        self.remainder = remainder
+        self.response = response
+        self.encoding = self._charset(self.headers.get('Content-Type'))
+        self.apparent_encoding = None
+        self._content = None
+
+    @staticmethod
+    def _charset(content_type):
+        for part in (content_type or '').split(';')[1:]:
+            name, _, value = part.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                return value.strip('"')
+        return None
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        with open(self.body_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size or CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        if self.remainder is not None:
+            yield from self.remainder
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b''.join(self.iter_content())
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+        if self.temporary:
+            try:
+                os.remove(self.body_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HttpCache:
+    """磁盘上的HTTP缓存，按地址保存响应内容和ETag/Last-Modified
+
+    - 在有效期内的响应直接从磁盘返回，不发出请求
+    - 过期后带If-None-Match/If-Modified-Since重新验证，返回304时继续使用缓存内容
+    - 缓存总大小超过上限时按最近使用时间淘汰（LRU）
+    命中、未命中和节省的下载字节数记录在stats中，用于调整有效期和容量。
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, max_entry_bytes=32 * 1024 * 1024, default_ttl=0):
+        """
+        Args:
+            root: 缓存目录
+            max_bytes: 缓存内容的总大小上限
+            max_entry_bytes: 单个响应的大小上限，更大的响应不缓存
+            default_ttl: 响应头中没有有效期信息时的有效期（秒），0表示每次都重新验证
+        """
+        self.root = root
+        self.body_dir = os.path.join(root, 'bodies')
+        os.makedirs(self.body_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        # hits：未发请求直接使用缓存；revalidated：服务端返回304；misses：下载了完整内容
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'bytes_saved': 0, 'stored': 0, 'evicted': 0}
+
+        self._conn = sqlite3.connect(os.path.join(root, 'index.db'), timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, body TEXT NOT NULL, size INTEGER NOT NULL, headers TEXT NOT NULL, "
+            "etag TEXT, last_modified TEXT, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)")
+
+    @staticmethod
+    def _body_name(url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(digest[:2], digest)
+
+    def lookup(self, url):
+        """查询缓存条目，返回字典，没有或内容文件已丢失时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, size, headers, etag, last_modified, expires_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        body, size, headers, etag, last_modified, expires_at = row
+        path = os.path.join(self.body_dir, body)
+        if not os.path.exists(path):
+            self._delete(url)
+            return None
+        return {'path': path, 'size': size, 'headers': json.loads(headers), 'etag': etag,
+                'last_modified': last_modified, 'expires_at': expires_at}
+
+    def request(self, rate_limiter, session, url, max_retries=None, headers=None, max_bytes=None, **kwargs):
+        """经过缓存发出GET请求
+
+        Args:
+            rate_limiter: 发出请求使用的限速器
+            session: requests.Session
+            url: 请求地址
+            max_retries: 重试次数
+            headers: 额外的请求头
+            max_bytes: 本次请求可缓存的最大响应大小（如图片的大小上限），默认为max_entry_bytes
+            **kwargs: 传给session.request的其他参数（如timeout）
+
+        Returns:
+            缓存可用时返回CachedResponse；不可缓存或状态码不是200时返回原始响应（流式）
+        """
+        kwargs.pop('stream', None)
+        entry = self.lookup(url)
+        if entry is not None and entry['expires_at'] > time.time():
+            self._record_reuse(url, entry, 'hits')
+            return CachedResponse(url, entry['headers'], entry['path'])
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        response = rate_limiter.request(
+            session, 'GET', url, max_retries=max_retries, headers=request_headers, stream=True, **kwargs
+        )
+
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            entry['headers'].update({name: response.headers[name] for name in STORED_HEADERS if name in response.headers})
+            lifetime = freshness_lifetime(entry['headers'], self.default_ttl) or 0
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE responses SET headers = ?, expires_at = ? WHERE url = ?",
+                    (json.dumps(entry['headers']), time.time() + lifetime, url)
+                )
+            self._record_reuse(url, entry, 'revalidated')
+            return CachedResponse(url, entry['headers'], entry['path'])
+
+        with self._lock:
+            self.stats['misses'] += 1
+        if response.status_code != 200:
+            return response
+        lifetime = freshness_lifetime(response.headers, self.default_ttl)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        content_length = int(response.headers.get('Content-Length') or 0)
+        limit = min(self.max_entry_bytes, max_bytes) if max_bytes else self.max_entry_bytes
+        # 不允许缓存、既没有有效期也无法重新验证、或者过大的响应直接交给调用方
+        if lifetime is None or (lifetime <= 0 and not etag and not last_modified) or content_length > limit:
+            return response
+        return self._store(url, response, lifetime, etag, last_modified, limit)
+
+    def _store(self, url, response, lifetime, etag, last_modified, limit):
+        """把响应内容写入缓存，返回读取缓存文件的CachedResponse
+
+        读取超过limit时停止写入缓存，已读取的部分和剩余内容交给调用方继续流式读取，由调用方决定是否放弃。
+        """
+        body = self._body_name(url)
+        path = os.path.join(self.body_dir, body)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 同一地址可能被并发请求，临时文件名各不相同
+        part_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+        size = 0
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+                        size += len(chunk)
+                        if size > limit:
+                            break
+        except Exception:
+            response.close()
+            self._remove(part_path)
+            raise
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        # 没有Content-Length、读取中才发现过大的响应不写入缓存
+        if size > limit:
+            return CachedResponse(url, headers, part_path, temporary=True, remainder=chunks, response=response)
+        response.close()
+        try:
+            os.replace(part_path, path)
+        except OSError:
+            # Windows下缓存文件正被其他线程读取时无法替换
+            return CachedResponse(url, headers, part_path, temporary=True)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, body, size, headers, etag, last_modified, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, size, json.dumps(headers), etag, last_modified, now + lifetime, now)
+            )
+            self.stats['stored'] += 1
+        self._evict()
+        return CachedResponse(url, headers, path)
+
+    def _record_reuse(self, url, entry, kind):
+        with self._lock:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.stats[kind] += 1
+            self.stats['bytes_saved'] += entry['size']
+
+    def _evict(self):
+        """总大小超过上限时，从最久未使用的条目开始删除"""
+        with self._lock:
+            # 多个进程可能共用缓存目录，每次从索引重新统计
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute("SELECT url, body, size FROM responses ORDER BY last_access").fetchall()
+            for url, body, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._remove(os.path.join(self.body_dir, body))
+                total -= size
+                self.stats['evicted'] += 1
+
+    def _delete(self, url):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def total_bytes(self):
+        """缓存内容的总大小"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def summary(self):
+        """统计信息的文字说明"""
+        stats = self.stats
+        requests_total = stats['hits'] + stats['revalidated'] + stats['misses']
+        hit_rate = (stats['hits'] + stats['revalidated']) / requests_total * 100 if requests_total else 0
+        return (f"HTTP缓存: 直接命中 {stats['hits']} 次，304验证 {stats['revalidated']} 次，"
+                f"未命中 {stats['misses']} 次（命中率 {hit_rate:.0f}%），节省 {stats['bytes_saved'] // 1024} KB 下载，"
+                f"淘汰 {stats['evicted']} 个，当前 {self.total_bytes() // 1024} KB")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_http_cache():
+    """获取按配置文件中crawler.http_cache创建的全局HTTP缓存，未启用时返回None"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            config_manager = ConfigManager()
+            config = (config_manager.get('crawler', {}) or {}).get('http_cache', {}) or {}
+            if not config.get('enabled', True):
+                return None
+            try:
+                _shared_cache = HttpCache(
+                    os.path.join(config_manager.media_base_dir, '.http_cache'),
+                    max_bytes=int(config.get('max_mb', 512) * 1024 * 1024),
+                    max_entry_bytes=int(config.get('max_entry_mb', 32) * 1024 * 1024),
+                    default_ttl=config.get('default_ttl', 0)
+                )
+            except (OSError, sqlite3.Error) as e:
+                print_to_queue(f"HTTP缓存初始化失败，已关闭缓存: {e}")
+                return None
+        return _shared_cache
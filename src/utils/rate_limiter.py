@@ -0,0 +1,280 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from config.config_manager import ConfigManager
+from utils.log_utils import print_to_queue
+
+# 表示服务端要求降速的状态码，需要退避后重试
+THROTTLE_STATUS_CODES = (429, 503)
+
+# 可以安全重发的请求方法；其他方法（如付费接口的POST）只在请求确定未被服务端处理时重试
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class CircuitOpenError(Exception):
+    """主机熔断期间拒绝发出请求"""
+
+
+class TokenBucket:
+    """令牌桶：平均每秒rate个请求，允许burst个请求的突发"""
+
+    def __init__(self, rate, burst):
+        self.max_rate = max(0.01, rate)
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        # Retry-After要求的暂停截止时间，暂停期间该主机的所有请求都等待
+        self.blocked_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，没有可用令牌时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """暂停该主机的请求"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def slow_down(self):
+        """服务端要求降速时速率减半（最低为配置值的1/16）"""
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def speed_up(self):
+        """请求成功时逐步恢复到配置的速率"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后在cooldown秒内拒绝请求，之后放行一个试探请求"""
+
+    def __init__(self, failure_threshold=5, cooldown=60):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否允许发出请求"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self.opened_at >= self.cooldown:
+                # 半开状态：只放行一个试探请求
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """记录一次失败，返回本次是否触发熔断"""
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._trial = False
+                return True
+            return False
+
+
+class RateLimiter:
+    """按主机限速的HTTP请求入口
+
+    - 每个主机一个令牌桶，按配置的速率发出请求，429/503时自动降速，成功后逐步恢复
+    - 失败时指数退避并加随机抖动，优先使用响应中的Retry-After
+    - 每个主机一个熔断器，连续失败后暂停请求该主机
+    所有HTTP请求共用一个实例（见get_rate_limiter），并发的下载和接口调用共享同一主机的配额。
+    """
+
+    def __init__(self, rate=5, burst=10, hosts=None, max_retries=3, backoff_base=1, backoff_max=60,
+                 failure_threshold=5, cooldown=60):
+        """
+        Args:
+            rate: 每个主机每秒的请求数
+            burst: 每个主机允许的突发请求数
+            hosts: 按主机覆盖的配置，如 {"api.deepseek.com": {"rate": 1, "burst": 2}}，子域名同样适用
+            max_retries: 默认重试次数
+            backoff_base: 退避的基础时长（秒），第n次重试最多等待 backoff_base * 2^(n-1) 秒
+            backoff_max: 单次退避的最大时长（秒）
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断持续时间（秒）
+        """
+        self.rate = rate
+        self.burst = burst
+        self.hosts = hosts or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _host_config(self, host):
+        """查找主机的覆盖配置，支持按父域名匹配"""
+        for name, config in self.hosts.items():
+            if host == name or host.endswith('.' + name):
+                return config or {}
+        return {}
+
+    def _host_state(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                config = self._host_config(host)
+                bucket = TokenBucket(config.get('rate', self.rate), config.get('burst', self.burst))
+                self._buckets[host] = bucket
+                self._breakers[host] = CircuitBreaker(
+                    config.get('failure_threshold', self.failure_threshold),
+                    config.get('cooldown', self.cooldown)
+                )
+            return bucket, self._breakers[host]
+
+    def backoff(self, attempt):
+        """第attempt次重试前的等待时长：指数增长，带完全随机抖动"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    @staticmethod
+    def retry_after(response):
+        """解析Retry-After响应头（秒数或HTTP日期），没有时返回None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def can_retry(method, error=None, status_code=None):
+        """判断失败的请求能否重发
+
+        GET等幂等请求在网络异常和429/5xx时都可以重发；其他请求只在连接超时（请求未发出）
+        或服务端以429/503拒绝时重发，读取超时或5xx时服务端可能已经处理过该请求。
+        """
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        if error is not None:
+            return isinstance(error, requests.exceptions.ConnectTimeout)
+        return status_code in THROTTLE_STATUS_CODES
+
+    def request(self, session, method, url, max_retries=None, **kwargs):
+        """经过限速、重试和熔断发出请求
+
+        非幂等请求（如POST）的重试条件见can_retry。
+
+        Args:
+            session: requests.Session或requests模块
+            method: 请求方法
+            url: 请求地址
+            max_retries: 重试次数，默认使用构造时的配置
+            **kwargs: 传给session.request的参数
+
+        Returns:
+            最后一次请求的响应（重试用尽时可能是429/5xx响应，由调用方判断状态码）
+
+        Raises:
+            CircuitOpenError: 主机处于熔断状态
+            requests.RequestException: 重试用尽后的最后一个网络异常
+        """
+        host = urlsplit(url).netloc
+        bucket, breaker = self._host_state(host)
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"主机 {host} 连续请求失败，暂停请求")
+            bucket.acquire()
+            try:
+                response = session.request(method, url, **kwargs)
+            except Exception as e:
+                if breaker.record_failure():
+                    print_to_queue(f"  [限速] 主机 {host} 连续失败，熔断 {breaker.cooldown} 秒")
+                if attempt >= max_retries or not self.can_retry(method, error=e):
+                    raise
+                attempt += 1
+                wait = self.backoff(attempt)
+                print_to_queue(f"  [限速] 请求 {host} 失败: {e}，{wait:.1f}秒后重试({attempt}/{max_retries})")
+                time.sleep(wait)
+                continue
+
+            if response.status_code not in THROTTLE_STATUS_CODES and response.status_code < 500:
+                breaker.record_success()
+                bucket.speed_up()
+                return response
+
+            # 服务端要求降速或出错
+            if breaker.record_failure():
+                print_to_queue(f"  [限速] 主机 {host} 连续失败，熔断 {breaker.cooldown} 秒")
+            if response.status_code in THROTTLE_STATUS_CODES:
+                bucket.slow_down()
+            if attempt >= max_retries or not self.can_retry(method, status_code=response.status_code):
+                return response
+            attempt += 1
+            wait = self.retry_after(response)
+            if wait is not None:
+                # Retry-After对该主机的所有请求生效
+                wait = min(wait, self.backoff_max)
+                bucket.block(wait)
+            else:
+                wait = self.backoff(attempt)
+            print_to_queue(f"  [限速] {host} 返回状态码 {response.status_code}，{wait:.1f}秒后重试({attempt}/{max_retries})")
+            response.close()
+            time.sleep(wait)
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """获取按配置文件中rate_limit创建的全局限速器"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            config = ConfigManager().get('rate_limit', {}) or {}
+            _shared_limiter = RateLimiter(
+                rate=config.get('rate', 5),
+                burst=config.get('burst', 10),
+                hosts=config.get('hosts', {}),
+                max_retries=config.get('max_retries', 3),
+                backoff_base=config.get('backoff_base', 1),
+                backoff_max=config.get('backoff_max', 60),
+                failure_threshold=config.get('failure_threshold', 5),
+                cooldown=config.get('cooldown', 60)
+            )
+        return _shared_limiter
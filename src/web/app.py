@@ -1,6 +1,7 @@
 import sys
 import os
 import queue
+import multiprocessing
 import requests
 from datetime import datetime
 
@@ -292,5 +293,7 @@ def generate_ai_content():
 
 
 if __name__ == "__main__":
+    # 打包后的程序启动图片后处理子进程时需要
+    multiprocessing.freeze_support()
     # 启动Flask服务器，使用端口5001以避免与系统AirPlay Receiver冲突
     app.run(host="0.0.0.0", port=5001, threaded=True)
\ No newline at end of file
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import shutil
+import tempfile
+from multiprocessing import Pool
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from crawlers.article_id_store import ArticleIdStore
+from crawlers.id_journal import ArticleIdJournal, STATUS_SAVED, STATUS_FAILED
+
+PROCESS_COUNT = 6
+ARTICLES_PER_PROCESS = 50
+
+
+def write_articles(args):
+    """子进程：通过共用的日志记录文章，期间穿插重放（模拟其他运行启动和结束）"""
+    db_file, worker = args
+    store = ArticleIdStore(db_file)
+    journal = ArticleIdJournal(db_file + '.journal', store, batch_size=3)
+    for i in range(ARTICLES_PER_PROCESS):
+        journal.record(f"{worker}-{i}", STATUS_SAVED)
+        if i % 17 == 0:
+            journal.replay(verbose=False)
+    journal.close()
+    store.close()
+
+
+def claim_articles(args):
+    """子进程：以自己的身份认领同一批文章，返回认领成功的文章ID"""
+    db_file, owner = args
+    store = ArticleIdStore(db_file)
+    claimed = [str(i) for i in range(100) if store.claim(str(i), owner)]
+    store.close()
+    return claimed
+
+
+def test_concurrent_journal():
+    """测试多个进程共用写后日志时，已提交的文章ID不会丢失"""
+    print("=== 测试多进程写后日志 ===")
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(work_dir, 'article_id.db')
+        ArticleIdStore(db_file).close()
+        with Pool(PROCESS_COUNT) as pool:
+            pool.map(write_articles, [(db_file, worker) for worker in range(PROCESS_COUNT)])
+
+        store = ArticleIdStore(db_file)
+        print(f"1. 数据库中的文章ID数量: {len(store)}")
+        assert len(store) == PROCESS_COUNT * ARTICLES_PER_PROCESS
+        journal_size = os.path.getsize(db_file + '.journal')
+        print(f"2. 运行结束后的日志大小: {journal_size}")
+        assert journal_size == 0
+        store.close()
+        print("✅ 多进程写后日志测试通过")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_journal_replay():
+    """测试崩溃后重放：只有saved记录进入存储"""
+    print("=== 测试日志重放 ===")
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(work_dir, 'article_id.db')
+        with open(db_file + '.journal', 'w', encoding='utf-8') as f:
+            f.write(f"1,{STATUS_SAVED},{time.time()}\n")
+            f.write(f"2,{STATUS_FAILED},{time.time()}\n")
+            f.write("损坏的记录\n")
+        store = ArticleIdStore(db_file)
+        journal = ArticleIdJournal(db_file + '.journal', store)
+        print(f"1. 重放后: 1 {'1' in store}，2 {'2' in store}")
+        assert '1' in store and '2' not in store
+        journal.close()
+        store.close()
+        print("✅ 日志重放测试通过")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_claims():
+    """测试文章认领：多个进程同时认领时每篇文章只有一个进程成功，释放和到期后可重新认领"""
+    print("=== 测试文章认领 ===")
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(work_dir, 'article_id.db')
+        ArticleIdStore(db_file).close()
+        with Pool(4) as pool:
+            results = pool.map(claim_articles, [(db_file, f"owner-{i}") for i in range(4)])
+        claimed = [article_id for result in results for article_id in result]
+        print(f"1. 认领成功 {len(claimed)} 次，不重复 {len(set(claimed))} 篇")
+        assert sorted(claimed, key=int) == [str(i) for i in range(100)]
+
+        store = ArticleIdStore(db_file)
+        owner = next(f"owner-{i}" for i, result in enumerate(results) if '0' in result)
+        assert not store.claim('0', 'other')
+        store.release_claims(['0'], owner)
+        print(f"2. 释放后重新认领: {store.claim('0', 'other')}")
+        assert store.claim('0', 'other')
+
+        store.add('1')
+        print(f"3. 已爬取的文章能否认领: {store.claim('1', 'other')}")
+        assert not store.claim('1', 'other')
+
+        assert store.claim('expiring', 'a', lease_seconds=0)
+        reclaimed = store.claim('expiring', 'b')
+        print(f"4. 租约到期后重新认领: {reclaimed}")
+        assert reclaimed
+        store.close()
+        print("✅ 文章认领测试通过")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_concurrent_journal()
+    test_journal_replay()
+    test_claims()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import requests
+from crawlers.hls_downloader import HlsDownloader
+from utils.rate_limiter import RateLimiter
+
+# 合成的TS分片（每个分片由若干188字节的TS包组成，内容各不相同）
+SEGMENTS = [bytes([0x47]) + bytes([i]) * 187 * (i + 1) for i in range(5)]
+
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    """本地HTTP服务：提供主播放列表、媒体播放列表和分片"""
+
+    def do_GET(self):
+        if self.path == '/master.m3u8':
+            body = (
+                "#EXTM3U\n"
+                "#EXT-X-STREAM-INF:BANDWIDTH=200000\n"
+                "low/index.m3u8\n"
+                "#EXT-X-STREAM-INF:BANDWIDTH=800000\n"
+                "high/index.m3u8\n"
+            ).encode('utf-8')
+        elif self.path in ('/high/index.m3u8', '/low/index.m3u8'):
+            lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+            for i in range(len(SEGMENTS)):
+                lines.append("#EXTINF:4.0,")
+                lines.append(f"seg{i}.ts")
+            lines.append("#EXT-X-ENDLIST")
+            body = ("\n".join(lines) + "\n").encode('utf-8')
+        elif self.path.startswith('/high/seg'):
+            index = int(self.path[len('/high/seg'):-len('.ts')])
+            body = SEGMENTS[index]
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_hls_download():
+    """测试HLS播放列表解析、分片并发下载和拼接"""
+    print("=== 测试HLS视频下载 ===")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PlaylistHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    save_dir = tempfile.mkdtemp()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        partial_dir = os.path.join(save_dir, '.partial')
+        downloader = HlsDownloader(
+            requests.Session(), RateLimiter(rate=100, burst=100), partial_dir,
+            workers=3, max_retries=0, remux=False
+        )
+
+        playlist = downloader.resolve(f"{base_url}/master.m3u8")
+        print(f"1. 选择的变体: {playlist.url}")
+        assert playlist.url.endswith('/high/index.m3u8')
+        print(f"2. 分片数量: {len(playlist.segments)}")
+        assert len(playlist.segments) == len(SEGMENTS)
+
+        video_path = downloader.download(f"{base_url}/master.m3u8", os.path.join(save_dir, 'video_1'))
+        print(f"3. 保存路径: {video_path}")
+        assert video_path == os.path.join(save_dir, 'video_1.ts')
+        with open(video_path, 'rb') as f:
+            content = f.read()
+        print(f"4. 文件大小: {len(content)} 字节")
+        assert content == b''.join(SEGMENTS)
+        assert sorted(os.listdir(save_dir)) == ['.partial', 'video_1.ts']
+        print(f"5. 完成后的分片目录: {os.listdir(partial_dir)}")
+        assert os.listdir(partial_dir) == []
+
+        missing = downloader.download(f"{base_url}/missing.m3u8", os.path.join(save_dir, 'video_2'))
+        print(f"6. 不存在的播放列表: {missing}")
+        assert missing is None
+        print("✅ HLS视频下载测试通过")
+    finally:
+        server.shutdown()
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_hls_download()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import io
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from config.config_manager import ConfigManager
+from crawlers import media_downloader
+from crawlers.media_downloader import MediaDownloader
+
+
+def _encode(image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _make_images():
+    """原图、内容相同的副本、CDN重新编码的缩小版本、拉伸为不同宽高比的版本"""
+    original = Image.new('RGB', (400, 300))
+    original.putdata([((x * 7) % 256, (y * 5) % 256, ((x + y) * 3) % 256) for y in range(300) for x in range(400)])
+    png = _encode(original, 'PNG')
+    return {
+        '/a.png': png,
+        '/a_copy.png': png,
+        '/a_small.jpg': _encode(original.resize((200, 150)), 'JPEG', quality=70),
+        '/a_wide.png': _encode(original.resize((400, 150)), 'PNG'),
+    }
+
+
+IMAGES = _make_images()
+# 每个路径收到的请求次数
+REQUEST_COUNTS = {}
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """本地HTTP服务：按路径返回图片"""
+
+    def do_GET(self):
+        path = self.path
+        REQUEST_COUNTS[path] = REQUEST_COUNTS.get(path, 0) + 1
+        body = IMAGES.get(path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg' if path.endswith('.jpg') else 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    """临时媒体目录和本地图片服务，返回(媒体目录, 服务地址)"""
+    media_dir = tempfile.mkdtemp()
+
+    class TempConfigManager(ConfigManager):
+        def __init__(self):
+            super().__init__()
+            self.media_base_dir = media_dir
+
+    monkeypatch.setattr(media_downloader, 'ConfigManager', TempConfigManager)
+    REQUEST_COUNTS.clear()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield media_dir, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    shutil.rmtree(media_dir, ignore_errors=True)
+
+
+def _download(media_dir, urls, article, policy=None):
+    """模拟一次运行：新建下载器下载一篇文章的图片后关闭"""
+    downloader = MediaDownloader()
+    if policy is not None:
+        downloader.phash_policy = policy
+    save_dir = os.path.join(media_dir, article)
+    os.makedirs(save_dir, exist_ok=True)
+    try:
+        return downloader.download_images(urls, save_dir)
+    finally:
+        downloader.close()
+
+
+def _blobs(media_dir):
+    blob_dir = os.path.join(media_dir, '.store', 'blobs')
+    return sorted(name for _, _, names in os.walk(blob_dir) for name in names)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_identical_images_across_runs(environment):
+    """测试两次运行下载相同图片：同一地址不再请求，不同地址的相同内容只保存一份"""
+    print("=== 测试相同图片跨运行复用 ===")
+    media_dir, base_url = environment
+    first = _download(media_dir, [f"{base_url}/a.png"], 'article_1')
+    second = _download(media_dir, [f"{base_url}/a.png", f"{base_url}/a_copy.png"], 'article_2')
+    print(f"1. 请求次数: {REQUEST_COUNTS}")
+    assert REQUEST_COUNTS == {'/a.png': 1, '/a_copy.png': 1}
+    print(f"2. 存储中的文件: {_blobs(media_dir)}")
+    assert len(_blobs(media_dir)) == 1
+    assert len(first) == 1 and len(second) == 2
+    for path in first + second:
+        assert _read(path) == IMAGES['/a.png']
+    print("✅ 相同图片跨运行复用测试通过")
+
+
+def test_perceptual_link(environment):
+    """测试link策略：文章中的相似图片链接到已有图片，新下载的文件和地址索引保留"""
+    print("=== 测试感知哈希link策略 ===")
+    media_dir, base_url = environment
+    original = _download(media_dir, [f"{base_url}/a.png"], 'article_1', policy='link')[0]
+    linked = _download(media_dir, [f"{base_url}/a_small.jpg"], 'article_2', policy='link')[0]
+    print(f"1. 相似图片保存为: {os.path.relpath(linked, media_dir)}")
+    assert _read(linked) == _read(original)
+    print(f"2. 存储中的文件数: {len(_blobs(media_dir))}")
+    assert len(_blobs(media_dir)) == 2
+
+    # 新下载的图片仍可按地址复用，不再请求
+    again = _download(media_dir, [f"{base_url}/a_small.jpg"], 'article_3', policy='keep')[0]
+    print(f"3. 再次下载缩小版本: 请求 {REQUEST_COUNTS['/a_small.jpg']} 次")
+    assert REQUEST_COUNTS['/a_small.jpg'] == 1
+    assert _read(again) == IMAGES['/a_small.jpg']
+
+    # 宽高比不同的图片不视为相同图片
+    wide = _download(media_dir, [f"{base_url}/a_wide.png"], 'article_4', policy='link')[0]
+    print(f"4. 宽高比不同的图片: {os.path.relpath(wide, media_dir)}")
+    assert _read(wide) == IMAGES['/a_wide.png']
+    print("✅ 感知哈希link策略测试通过")
+
+
+def test_perceptual_keep(environment):
+    """测试默认的keep策略：相似图片照常保存"""
+    print("=== 测试感知哈希keep策略 ===")
+    media_dir, base_url = environment
+    downloader = MediaDownloader()
+    assert downloader.phash_policy == 'keep'
+    downloader.close()
+    _download(media_dir, [f"{base_url}/a.png"], 'article_1')
+    kept = _download(media_dir, [f"{base_url}/a_small.jpg"], 'article_2')[0]
+    assert _read(kept) == IMAGES['/a_small.jpg']
+    print("✅ 感知哈希keep策略测试通过")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q', '-s']))
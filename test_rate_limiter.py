@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import requests
+from utils.rate_limiter import RateLimiter
+
+# 每个路径收到的请求次数
+REQUEST_COUNTS = {}
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """本地HTTP服务：路径为要返回的状态码，如 /500、/429"""
+
+    def _respond(self):
+        key = f"{self.command} {self.path}"
+        REQUEST_COUNTS[key] = REQUEST_COUNTS.get(key, 0) + 1
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(int(self.path.strip('/')))
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+def test_can_retry():
+    """测试重试条件：幂等请求总是可以重试，POST只在请求确定未被处理时重试"""
+    print("=== 测试重试条件 ===")
+    read_timeout = requests.exceptions.ReadTimeout()
+    connect_timeout = requests.exceptions.ConnectTimeout()
+    cases = [
+        (('GET',), {'error': read_timeout}, True),
+        (('GET',), {'status_code': 500}, True),
+        (('POST',), {'error': read_timeout}, False),
+        (('POST',), {'error': requests.exceptions.ChunkedEncodingError()}, False),
+        (('POST',), {'error': connect_timeout}, True),
+        (('POST',), {'status_code': 500}, False),
+        (('POST',), {'status_code': 429}, True),
+        (('post',), {'status_code': 503}, True),
+    ]
+    for args, kwargs, expected in cases:
+        result = RateLimiter.can_retry(*args, **kwargs)
+        print(f"  {args[0]} {kwargs}: {result}")
+        assert result == expected
+    print("✅ 重试条件测试通过")
+
+
+def test_retry_counts():
+    """测试实际发出的请求次数：POST遇到500只发一次，遇到429按重试次数重发"""
+    print("=== 测试请求重试次数 ===")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        limiter = RateLimiter(rate=100, burst=100, backoff_base=0.01, failure_threshold=100)
+        session = requests.Session()
+        for method, path in (('POST', '/500'), ('POST', '/429'), ('GET', '/500')):
+            response = limiter.request(session, method, base_url + path, max_retries=3, json={}, timeout=5)
+            print(f"  {method} {path}: 状态码 {response.status_code}，请求 {REQUEST_COUNTS[f'{method} {path}']} 次")
+        assert REQUEST_COUNTS['POST /500'] == 1
+        assert REQUEST_COUNTS['POST /429'] == 4
+        assert REQUEST_COUNTS['GET /500'] == 4
+        print("✅ 请求重试次数测试通过")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_can_retry()
+    test_retry_counts()